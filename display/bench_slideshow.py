@@ -0,0 +1,358 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Headless benchmark of slideshow.py on generated media libraries.
+
+Runs the real run_slideshow() under SDL's dummy video driver, against fixture
+trees built in a temporary folder, and prints one JSON document so runs can
+be compared across commits:
+
+    python bench_slideshow.py --photos 100 --roms 50000 -o before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from manifest import MANIFEST_NAME, MANIFEST_VERSION
+from gamelist import GamelistIndex, GAMELIST_NAME
+
+# Systems of the synthetic ROMs tree
+SYSTEMS = ("snes", "megadrive", "nes", "gba", "psx", "n64", "mame", "neogeo", "pcengine", "mastersystem")
+
+# Distinct generated photos; the library is made of copies of them
+PHOTO_VARIANTS = 8
+
+# (name, run_slideshow arguments, settings overrides)
+SCENARIOS = (
+    ("animation", {"enable_animation": True}, {}),
+    ("no_animation", {"enable_animation": False}, {}),
+    ("cycle", {"enable_animation": True}, {"current_mode": 4}),
+    # Dims after 6 s and blanks after 12 s without input
+    ("low_power", {"enable_animation": True}, {"dim_after_min": 0.1, "blank_after_min": 0.2}),
+)
+
+
+def make_photos(folder, count, size):
+    """Writes count JPEGs into folder, labelled half by manifest.json, half by .txt sidecars."""
+    import pygame
+    os.makedirs(folder)
+    variants = []
+    for i in range(PHOTO_VARIANTS):
+        surface = pygame.Surface(size)
+        rnd = random.Random(i)
+        for y in range(0, size[1], 16):
+            surface.fill((rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255)), (0, y, size[0], 16))
+        path = os.path.join(folder, "variant_%d.jpg" % i)
+        pygame.image.save(surface, path)
+        variants.append(path)
+    files = {}
+    for i in range(count):
+        path = os.path.join(folder, "photo_%05d.jpg" % i)
+        shutil.copyfile(variants[i % len(variants)], path)
+        entry = {"label": "Photo %d - bench" % i, "info": "2024-01-01 12:00", "source_path": "/photos/2024/bench/photo_%05d.jpg" % i}
+        if i % 2 == 0:
+            # Half in the manifest, half in sidecars, like a library the selector updated
+            files[os.path.basename(path)] = entry
+        else:
+            with open(os.path.splitext(path)[0] + ".txt", 'w') as f:
+                f.write("%s\n%s\n%s\n" % (entry["label"], entry["info"], entry["source_path"]))
+    with open(os.path.join(folder, MANIFEST_NAME), 'w') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f)
+    for path in variants:
+        os.remove(path)
+
+
+def make_roms_tree(top, count):
+    """Spreads count empty files over SYSTEMS: roms, media/images and media/videos, with a gamelist.xml per system."""
+    per_system = max(1, count // len(SYSTEMS))
+    for system in SYSTEMS:
+        media = os.path.join(top, system, "media")
+        for sub in ("images", "videos"):
+            os.makedirs(os.path.join(media, sub))
+        games = []
+        for i in range(per_system):
+            name = "Game %05d (Europe)" % i
+            if i % 3 == 0:
+                path = os.path.join(media, "videos", name + ".mp4")
+            elif i % 3 == 1:
+                path = os.path.join(media, "images", name + ".png")
+            else:
+                path = os.path.join(top, system, name + ".zip")
+            open(path, 'w').close()
+            games.append(name)
+        with open(os.path.join(top, system, GAMELIST_NAME), 'w') as f:
+            f.write('<?xml version="1.0"?>\n<gameList>\n')
+            for i, name in enumerate(games):
+                # Scraped entries carry a description, as big as the real ones
+                f.write('<game id="%d"><path>./%s.zip</path><name>Bench Game %d</name><desc>%s</desc>'
+                        '<video>./media/videos/%s.mp4</video><releasedate>19%02d0101T000000</releasedate>'
+                        '<genre>Platform</genre></game>\n' % (i, name, i, "Lorem ipsum " * 40, name, 80 + i % 20))
+            f.write('</gameList>\n')
+
+
+def make_videos(folder, count):
+    os.makedirs(folder)
+    for i in range(count):
+        open(os.path.join(folder, "video_%03d.mp4" % i), 'w').close()
+
+
+def make_omxplayer_stub(bin_dir, seconds):
+    os.makedirs(bin_dir)
+    path = os.path.join(bin_dir, "omxplayer")
+    with open(path, 'w') as f:
+        f.write("#!/bin/sh\nexec sleep %s\n" % seconds)
+    os.chmod(path, 0o755)
+
+
+def configure(slideshow, cfg):
+    slideshow.IMAGE_FOLDER = cfg["photos"]
+    slideshow.VIDEO_PERSO_FOLDER = cfg["videos"]
+    slideshow.ROMS_FOLDER = cfg["roms"]
+    slideshow.SETTINGS_FILE = cfg["settings"]
+    slideshow.MEDIA_INDEX_FILE = cfg["index"]
+    slideshow.GAMELIST_CACHE_FILE = cfg["gamelists"]
+    slideshow.PIXEL_CACHE_FOLDER = cfg["pixel_cache"]
+    slideshow.CYCLE_INTERVAL = cfg["cycle_interval"]
+
+
+def bench_index(cfg):
+    """Times the media index: full build, load, unchanged refresh and first files() per mode."""
+    import slideshow
+    configure(slideshow, cfg)
+    result = {}
+    index = slideshow.build_media_index()
+    start = time.time(); index.refresh(full=True)
+    result["build_ms"] = round((time.time() - start) * 1000.0, 1)
+    result["dirs_listed"] = index.listed_dirs
+    index = slideshow.build_media_index()
+    start = time.time(); index.load()
+    result["load_ms"] = round((time.time() - start) * 1000.0, 1)
+    start = time.time(); index.refresh()
+    result["refresh_ms"] = round((time.time() - start) * 1000.0, 1)
+    result["refresh_dirs_listed"] = index.listed_dirs
+    names = {slideshow.MODE_PHOTOS: "photos", slideshow.MODE_VIDEOS_PERSO: "videos", slideshow.MODE_VIDEOS_GAMES: "games"}
+    result["files"] = {}
+    for mode, name in sorted(names.items()):
+        start = time.time(); files = index.files(mode)
+        result["files"][name] = {"count": len(files), "first_ms": round((time.time() - start) * 1000.0, 2)}
+    gamelists = GamelistIndex(cfg["roms"], cfg["gamelists"])
+    start = time.time(); gamelists.refresh()
+    result["gamelists"] = {"games": len(gamelists), "parse_ms": round((time.time() - start) * 1000.0, 1)}
+    gamelists = GamelistIndex(cfg["roms"], cfg["gamelists"])
+    start = time.time(); gamelists.load(); gamelists.refresh()
+    result["gamelists"]["cached_ms"] = round((time.time() - start) * 1000.0, 1)
+    videos = index.files(slideshow.MODE_VIDEOS_GAMES)
+    start = time.time()
+    found = sum(1 for path in videos if gamelists.get(path))
+    result["gamelists"]["lookup_us"] = round((time.time() - start) * 1e6 / max(1, len(videos)), 2)
+    result["gamelists"]["videos_matched"] = found
+    return result
+
+
+def run_child(cfg):
+    """Runs one scenario inside this process; stops it after cfg["duration"] seconds."""
+    import pygame
+    import slideshow
+    configure(slideshow, cfg)
+    stopper = threading.Timer(cfg["duration"], lambda: pygame.event.post(pygame.event.Event(pygame.QUIT)))
+    stopper.daemon = True
+    stopper.start()
+    try:
+        slideshow.run_slideshow(**cfg["args"])
+    except SystemExit:
+        pass
+
+
+def run_scenario(name, args, settings, cfg, workdir):
+    with open(cfg["settings"], 'w') as f:
+        data = {"display_time": cfg["display_time"], "current_mode": 1}
+        data.update(settings)
+        json.dump(data, f)
+    stats_path = os.path.join(workdir, "stats_%s.json" % name)
+    child_cfg = dict(cfg, args=args)
+    env = dict(os.environ)
+    env.update({
+        "SDL_VIDEODRIVER": "dummy",
+        "SDL_AUDIODRIVER": "dummy",
+        "SLIDESHOW_PROFILE": stats_path,
+        # No real buttons: the glob matches no device
+        "SLIDESHOW_INPUT_GLOB": os.path.join(workdir, "input", "event*"),
+        "PATH": os.path.join(workdir, "bin") + os.pathsep + env.get("PATH", ""),
+        "SLIDESHOW_LAUNCHED_AT": repr(time.time()),
+        "SLIDESHOW_FB_BLANK": os.path.join(workdir, "fb_blank"),
+    })
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", json.dumps(child_cfg)],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    output = proc.communicate()[0]
+    result = {"exit_code": proc.returncode}
+    for line in output.splitlines():
+        if line.startswith("[PERF] First frame after "):
+            result["first_frame_ms"] = int(line.split()[4])
+    try:
+        with open(stats_path) as f:
+            stats = json.load(f)
+    except (IOError, OSError, ValueError):
+        result["error"] = output[-2000:]
+        return result
+    events = stats.get("events_ms", {})
+    result.update({
+        "fps": stats.get("fps"),
+        "frames": stats.get("frames"),
+        "dropped": stats.get("dropped"),
+        "render_ms_avg": stats.get("render_ms_avg"),
+        "flip_ms_avg": stats.get("flip_ms_avg"),
+        "slide_load_ms": events.get("slide_load"),
+        "mode_switch_ms": events.get("mode_switch"),
+        "prefetch_hit_rate": stats.get("prefetch_hit_rate"),
+        "pixel_cache": stats.get("pixel_cache"),
+        "video_launches": stats.get("video_launches"),
+        "power": stats.get("power"),
+        "phases_ms": stats.get("phases_ms"),
+        "counters": stats.get("counters"),
+        "rss_kb": stats.get("rss_kb"),
+        "peak_rss_kb": stats.get("peak_rss_kb"),
+    })
+    return result
+
+
+def bench_transitions(screen_size, depth):
+    """Times every frame of each photo transition, zoom included, against the frame budget."""
+    import pygame
+    import slideshow
+    from frame_clock import DEFAULT_FPS
+    from zoom import ZoomRenderer
+    from transitions import TransitionRenderer, TRANSITIONS, BLEND_ENGINES
+    screen = pygame.Surface(screen_size, 0, depth)
+    photos = []
+    for color in ((200, 40, 40), (40, 40, 200)):
+        photo = pygame.Surface(screen_size, 0, depth)
+        photo.fill(color)
+        photo.fill((255, 255, 255), (screen_size[0] // 4, screen_size[1] // 4, screen_size[0] // 2, screen_size[1] // 2))
+        photos.append(photo)
+    budget = 1000.0 / DEFAULT_FPS
+    result = {"budget_ms": round(budget, 1)}
+    variants = [("none", None)] + [(kind, None) for kind in TRANSITIONS if kind not in ("crossfade", "cut")]
+    variants += [("crossfade", blend) for blend in BLEND_ENGINES]
+    step = slideshow.FADE_SPEED * slideshow.REFERENCE_FPS / DEFAULT_FPS
+    for kind, blend in variants:
+        renderer = TransitionRenderer("cut" if kind == "none" else kind, blend or "blit")
+        zoom = ZoomRenderer()
+        zoom.reset(photos[0])
+        renderer.draw(screen, zoom, 1.0, 255)
+        renderer.begin(screen)
+        zoom.reset(photos[1])
+        times = []
+        alpha, zoom_factor = renderer.start_alpha(), 1.0
+        # A whole transition, then as many frames again to average over
+        for _ in range(int(2 * 255 / step) + 1):
+            start = time.time()
+            renderer.draw(screen, zoom, zoom_factor, int(alpha))
+            times.append((time.time() - start) * 1000.0)
+            alpha = min(255, alpha + step)
+            zoom_factor += slideshow.ZOOM_SPEED * slideshow.REFERENCE_FPS / DEFAULT_FPS
+            if kind == "none":
+                alpha = 255
+        name = kind if blend is None else "%s/%s" % (kind, blend)
+        result[name] = {"avg_ms": round(sum(times) / len(times), 2), "max_ms": round(max(times), 2),
+                        "within_budget": max(times) <= budget}
+        if blend and renderer.blend != blend:
+            result[name]["fell_back_to"] = renderer.blend
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.STDOUT, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the slideshow on generated media libraries.")
+    parser.add_argument("--photos", type=int, default=100, help="photos in the fixture library")
+    parser.add_argument("--roms", type=int, default=5000, help="files in the fixture ROMs tree (up to 50000 or more)")
+    parser.add_argument("--videos", type=int, default=20, help="personal videos")
+    parser.add_argument("--photo-size", default="1920x1080", help="WxH of the generated photos")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--display-time", type=float, default=2.0, help="seconds per photo")
+    parser.add_argument("--cycle-interval", type=float, default=4.0, help="seconds per mode in the cycle scenario")
+    parser.add_argument("--video-length", type=float, default=1.0, help="seconds the omxplayer stub runs")
+    parser.add_argument("--screen-size", default="1280x1024", help="WxH of the screen for the transition timings")
+    parser.add_argument("--scenario", action="append", choices=[s[0] for s in SCENARIOS], help="run only these scenarios")
+    parser.add_argument("-o", "--output", help="also write the JSON results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the fixture folder")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return 0
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    import pygame
+    pygame.init()
+
+    workdir = tempfile.mkdtemp(prefix="slideshow_bench_")
+    cfg = {
+        "photos": os.path.join(workdir, "images"),
+        "videos": os.path.join(workdir, "videos"),
+        "roms": os.path.join(workdir, "roms"),
+        "settings": os.path.join(workdir, "slideshow_settings.json"),
+        "index": os.path.join(workdir, "media_index.json"),
+        "gamelists": os.path.join(workdir, "gamelist_index.json"),
+        "pixel_cache": os.path.join(workdir, "cache"),
+        "duration": args.duration,
+        "display_time": args.display_time,
+        "cycle_interval": args.cycle_interval,
+    }
+    try:
+        start = time.time()
+        make_photos(cfg["photos"], args.photos, tuple(int(v) for v in args.photo_size.split("x")))
+        make_videos(cfg["videos"], args.videos)
+        make_roms_tree(cfg["roms"], args.roms)
+        make_omxplayer_stub(os.path.join(workdir, "bin"), args.video_length)
+        os.makedirs(os.path.join(workdir, "input"))
+        sys.stderr.write("[BENCH] Fixtures generated in %.1fs in %s\n" % (time.time() - start, workdir))
+
+        results = {
+            "revision": git_revision(),
+            "time": int(time.time()),
+            "python": sys.version.split()[0],
+            "fixtures": {"photos": args.photos, "roms_files": args.roms, "videos": args.videos,
+                         "photo_size": args.photo_size, "display_time": args.display_time},
+            "index": bench_index(cfg),
+            "transitions": {},
+            "scenarios": {},
+        }
+        screen_size = tuple(int(v) for v in args.screen_size.split("x"))
+        for depth in (16, 32):
+            results["transitions"]["%dx%d@%d" % (screen_size + (depth,))] = bench_transitions(screen_size, depth)
+        for name, run_args, settings in SCENARIOS:
+            if args.scenario and name not in args.scenario:
+                continue
+            sys.stderr.write("[BENCH] Running %s (%.0fs)\n" % (name, args.duration))
+            results["scenarios"][name] = run_scenario(name, run_args, settings, cfg, workdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
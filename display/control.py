@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import socket
+import select
+
+# Local socket used by the idle monitor to drive the resident slideshow
+CONTROL_SOCKET = "/tmp/slideshow.sock"
+
+
+class ControlServer(object):
+    """Line-based command socket on the resident slideshow's side.
+
+    One client at a time: the monitor connects, sends a command and keeps the
+    connection open to receive the replies (e.g. "shown 850" then "hidden").
+    """
+
+    def __init__(self, path=CONTROL_SOCKET):
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(1)
+        self.conn = None
+        self._buffer = b""
+
+    def wait_command(self, timeout=None):
+        """Returns the next command line, or None if none arrived within timeout."""
+        while b"\n" not in self._buffer:
+            if self.conn is None:
+                if not select.select([self.sock], [], [], timeout)[0]:
+                    return None
+                self.conn, _ = self.sock.accept()
+                self._buffer = b""
+            if not select.select([self.conn], [], [], timeout)[0]:
+                return None
+            data = self.conn.recv(256)
+            if not data:
+                self.conn.close()
+                self.conn = None
+                continue
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode('utf-8', 'ignore').strip()
+
+    def reply(self, message):
+        if self.conn is None:
+            return
+        try:
+            self.conn.sendall((message + "\n").encode('utf-8'))
+        except socket.error:
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class ControlClient(object):
+    """Monitor side of the control socket."""
+
+    def __init__(self, path=CONTROL_SOCKET, timeout=2.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self._buffer = b""
+
+    def send(self, command):
+        self.sock.sendall((command + "\n").encode('utf-8'))
+
+    def read_line(self, timeout=None):
+        """Returns the next reply line, or None if the slideshow went away."""
+        self.sock.settimeout(timeout)
+        while b"\n" not in self._buffer:
+            try:
+                data = self.sock.recv(256)
+            except socket.timeout:
+                return None
+            if not data:
+                return None
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode('utf-8', 'ignore').strip()
+
+    def request(self, command, timeout=None):
+        self.send(command)
+        return self.read_line(timeout)
+
+    def close(self):
+        self.sock.close()
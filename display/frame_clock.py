@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import time
+
+DEFAULT_FPS = 25
+
+# Longest step fed to the animations, so a stall (slow load, blocked flip)
+# doesn't make the zoom jump forward.
+MAX_FRAME_DT = 0.25
+
+# Longest wait between two frames while nothing on screen is changing
+IDLE_FRAME_TIME = 0.25
+
+
+class RunningStat(object):
+    """Keeps the last value, a smoothed average and the maximum of a timing."""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.last = 0.0
+        self.avg = 0.0
+        self.max = 0.0
+        self.count = 0
+
+    def add(self, value):
+        self.last = value
+        self.avg = value if not self.count else self.avg + self.smoothing * (value - self.avg)
+        self.max = max(self.max, value)
+        self.count += 1
+
+
+class FrameScheduler(object):
+    """Paces the main loop to a target frame rate and measures frame timings."""
+
+    def __init__(self, target_fps=DEFAULT_FPS):
+        self.set_fps(target_fps)
+        self.idle_frame_time = IDLE_FRAME_TIME
+        self.last_tick = time.time()
+        self.next_deadline = self.last_tick + self.frame_time
+        self.deadline_reached = True
+        self.started = self.last_tick
+        self.frames = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.render_ms = RunningStat()
+        self.flip_ms = RunningStat()
+        self._mark = None
+
+    def set_fps(self, target_fps):
+        self.target_fps = max(1, target_fps)
+        self.frame_time = 1.0 / self.target_fps
+
+    def tick(self):
+        """Starts a frame and returns the seconds elapsed since the previous one."""
+        now = time.time()
+        dt = min(now - self.last_tick, MAX_FRAME_DT)
+        self.last_tick = now
+        return dt
+
+    def begin_render(self):
+        self._mark = time.time()
+
+    def begin_flip(self):
+        now = time.time()
+        self.render_ms.add((now - self._mark) * 1000.0)
+        self._mark = now
+
+    def end_flip(self):
+        self.flip_ms.add((time.time() - self._mark) * 1000.0)
+        self.frames += 1
+
+    def skip(self):
+        """Records a frame where nothing changed and nothing was drawn."""
+        self.skipped += 1
+
+    def due(self):
+        """True if the last wait() ran to its deadline, or once the pending one has passed."""
+        return self.deadline_reached or time.time() >= self.next_deadline
+
+    def wait(self, poll=None, idle=False):
+        """Waits until the next frame is due, counting the frames we missed.
+
+        poll(timeout) replaces the sleep and may return early with input; the
+        frame deadline then stands for the next call. A late frame still polls,
+        without waiting, so input is read however slow the rendering is. When
+        idle (nothing is animating) the next frame is only due after
+        idle_frame_time.
+        """
+        now = time.time()
+        if idle:
+            self.next_deadline = max(self.next_deadline, self.last_tick + self.idle_frame_time)
+        remaining = self.next_deadline - now
+        result = None
+        if remaining > 0:
+            result = poll(remaining) if poll else time.sleep(remaining)
+            if result:
+                self.deadline_reached = False
+                return result
+            self.next_deadline += self.frame_time
+        else:
+            if poll: result = poll(0)
+            # The missed deadline counts even when it is less than a frame late
+            self.dropped += int(-remaining / self.frame_time) + 1
+            self.next_deadline = now + self.frame_time
+        self.deadline_reached = True
+        return result
+
+    def fps(self):
+        elapsed = time.time() - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        return {
+            "fps": round(self.fps(), 1),
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "render_ms_avg": round(self.render_ms.avg, 2),
+            "render_ms_max": round(self.render_ms.max, 2),
+            "flip_ms_avg": round(self.flip_ms.avg, 2),
+            "flip_ms_max": round(self.flip_ms.max, 2),
+        }
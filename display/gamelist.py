@@ -0,0 +1,156 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import json
+import threading
+import xml.etree.ElementTree as ET
+
+from media_index import write_json_atomic
+
+GAMELIST_NAME = "gamelist.xml"
+CACHE_VERSION = 1
+
+# Fields kept per game, in this order in the cache
+FIELDS = ("name", "year", "genre")
+
+
+def parse_gamelist(path):
+    """Streams a gamelist.xml. Returns (games, videos, stems).
+
+    games is a list of [name, year, genre]; videos maps the <video> paths
+    (relative to the system folder) and stems the ROM file names without
+    extension to an index in games. Elements are cleared as soon as they are
+    read, so a multi-megabyte gamelist never sits in memory as a tree.
+    """
+    games, videos, stems = [], {}, {}
+    root = None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if root is None:
+            root = elem
+            continue
+        if event != "end" or elem.tag != "game":
+            continue
+        name = (elem.findtext("name") or u"").strip()
+        if name:
+            date = (elem.findtext("releasedate") or u"").strip()
+            year = date[:4] if date[:4].isdigit() and date[:4] != "0000" else u""
+            games.append([name, year, (elem.findtext("genre") or u"").strip()])
+            video = (elem.findtext("video") or u"").strip()
+            if video:
+                videos[os.path.normpath(video)] = len(games) - 1
+            rom = (elem.findtext("path") or u"").strip()
+            if rom:
+                stems[os.path.splitext(os.path.basename(rom))[0]] = len(games) - 1
+        # Drops the parsed <game> from the root as well as its children
+        elem.clear()
+        root.clear()
+    return games, videos, stems
+
+
+class GamelistIndex(object):
+    """Game names, years and genres of the game videos, from every system's gamelist.xml.
+
+    Parsed gamelists are kept in a JSON cache with their mtime and size; a
+    refresh costs one stat() per system and only re-parses the gamelists that
+    changed. get() is a dict lookup: by the <video> path first, then by the
+    ROM name matching the video file name.
+    """
+
+    def __init__(self, roms_folder, cache_path):
+        self.roms_folder = roms_folder
+        self.cache_path = cache_path
+        self.systems = {}  # system folder -> {"stamp", "games", "videos", "stems"}
+        self.parsed = 0
+        self._by_video = {}
+        self._by_stem = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def load(self):
+        """Loads the cache; returns False if there is none (or it is unusable)."""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+            if data.get("version") != CACHE_VERSION:
+                return False
+            self._install(data.get("systems", {}))
+        except Exception:
+            return False
+        return True
+
+    def refresh(self):
+        """Re-parses the gamelists that changed since the cache, then saves it."""
+        self.parsed = 0
+        systems = {}
+        try:
+            names = sorted(os.listdir(self.roms_folder))
+        except OSError:
+            names = []
+        for name in names:
+            folder = os.path.join(self.roms_folder, name)
+            path = os.path.join(folder, GAMELIST_NAME)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stamp = [st.st_mtime, st.st_size]
+            entry = self.systems.get(folder)
+            if entry is None or entry["stamp"] != stamp:
+                try:
+                    games, videos, stems = parse_gamelist(path)
+                except (ET.ParseError, IOError, OSError) as e:
+                    # Kept (empty) with its stamp: not parsed again until the file changes
+                    print("[WARNING] Cannot read %s: %s" % (path, e))
+                    games, videos, stems = [], {}, {}
+                entry = {"stamp": stamp, "games": games, "videos": videos, "stems": stems}
+                self.parsed += 1
+            systems[folder] = entry
+        changed = self.parsed or set(systems) != set(self.systems)
+        self._install(systems)
+        if changed:
+            try:
+                write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "systems": systems})
+            except (IOError, OSError) as e:
+                print("[WARNING] Cannot save %s: %s" % (self.cache_path, e))
+
+    def refresh_in_background(self):
+        """Loads the cache (unless already loaded) then refreshes it, off the caller's thread.
+
+        Does nothing while a previous refresh is still running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        def run():
+            if not self.systems: self.load()
+            self.refresh()
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _install(self, systems):
+        by_video, by_stem = {}, {}
+        for folder, entry in systems.items():
+            games = entry["games"]
+            for video, i in entry["videos"].items():
+                by_video[os.path.join(folder, video)] = games[i]
+            for stem, i in entry["stems"].items():
+                by_stem[(folder, stem)] = games[i]
+        with self._lock:
+            self.systems = systems
+            self._by_video = by_video
+            self._by_stem = by_stem
+
+    def get(self, video_path):
+        """Returns {name, year, genre} for a game video, or None if no gamelist knows it."""
+        video_path = os.path.normpath(video_path)
+        with self._lock:
+            game = self._by_video.get(video_path)
+            if game is None:
+                # <system>/media/videos/<rom name>.mp4
+                rel = os.path.relpath(video_path, self.roms_folder).split(os.sep)
+                stem = os.path.splitext(rel[-1])[0]
+                game = self._by_stem.get((os.path.join(self.roms_folder, rel[0]), stem))
+        return dict(zip(FIELDS, game)) if game is not None else None
+
+    def __len__(self):
+        return sum(len(entry["games"]) for entry in self.systems.values())
@@ -3,10 +3,14 @@
 import os
 import time
 import subprocess
-import glob
-import fcntl
+import socket
 import sys
 
+from input_reader import InputReader
+from proc_watch import ProcessWatcher
+from control import ControlClient, CONTROL_SOCKET
+from profiler import ActionTrace
+
 # --- CONFIGURATION ---
 # Time in seconds before the screensaver starts
 TIMEOUT_SECONDS = 60
@@ -17,109 +21,239 @@ GAME_PROCESSES = ["retroarch", "mupen64plus", "fba2x", "ppsspp", "dolphin-emu"]
 # Path to the slideshow script
 SLIDESHOW_SCRIPT = "/recalbox/share/userscripts/slideshow/slideshow.py"
 
+# Extra slideshow options, for the resident and the cold-started slideshow alike
+# (e.g. ["--no-animation"] if the Raspberry Pi struggles with the animation)
+SLIDESHOW_ARGS = []
+
+# Downscale oversized photos of the slideshow folder in the background at startup
+NORMALIZE_PHOTOS = True
+NORMALIZE_SCRIPT = "/recalbox/share/userscripts/slideshow/normalize_photos.py"
+
+# Keep the slideshow loaded in memory between idle sessions (slideshow.py --daemon).
+# Falls back to starting a new slideshow process if the resident one doesn't answer.
+RESIDENT_SLIDESHOW = True
+
+# Max seconds to wait for the resident slideshow to display its first frame
+SHOW_TIMEOUT = 10
+
 # Path to EmulationStation start script (Recalbox specific)
 ES_START_SCRIPT = "/etc/init.d/S31emulationstation"
+
+# Max seconds to wait for EmulationStation to exit (and release the display) before SIGKILL
+ES_STOP_TIMEOUT = 5
+
+# How often (seconds) to re-check running games and refresh the countdown while idle
+CHECK_INTERVAL = 1.0
+
+# While a game runs and nobody touches the controls, the check slows down to this
+# (input still wakes the monitor at once, only noticing the end of the game is delayed)
+GAME_CHECK_INTERVAL = 5.0
+
+# With no game and no input, the checks back off from CHECK_INTERVAL up to this.
+# The screensaver still starts on time: a wait never runs past the timeout.
+IDLE_CHECK_INTERVAL = 15.0
+
+# Pause after detected activity, so a busy joystick doesn't wake us for every event
+ACTIVITY_HOLDOFF = 0.5
 # ---------------------
 
-def get_input_devices():
-    """Finds all input event devices (joysticks, buttons, etc.)."""
-    return glob.glob('/dev/input/event*')
+game_watcher = ProcessWatcher(GAME_PROCESSES)
 
 def is_game_running():
     """Checks if any gaming emulator is currently active."""
+    return game_watcher.is_running()
+
+es_watcher = ProcessWatcher(["emulationstation"])
+resident_proc = None
+es_start_proc = None
+normalize_proc = None
+# Timestamped actions for input replays (set SLIDESHOW_TRACE)
+trace = ActionTrace()
+
+class TransitionLog(object):
+    """Times each phase of a screensaver transition and logs it."""
+
+    def __init__(self):
+        self.start = self.last = time.time()
+
+    def phase(self, name):
+        now = time.time()
+        sys.stdout.write("[PERF] %-20s %6d ms\n" % (name, (now - self.last) * 1000))
+        sys.stdout.flush()
+        self.last = now
+
+    def total(self, name):
+        sys.stdout.write("[PERF] %-20s %6d ms\n" % (name, (time.time() - self.start) * 1000))
+        sys.stdout.flush()
+
+def start_resident_slideshow():
+    """Starts the slideshow in resident mode so it is ready before the first timeout."""
+    global resident_proc
+    if resident_proc is None or resident_proc.poll() is not None:
+        resident_proc = subprocess.Popen(["python", SLIDESHOW_SCRIPT, "--daemon"] + SLIDESHOW_ARGS)
+
+def stop_resident_slideshow():
+    if resident_proc is not None and resident_proc.poll() is None:
+        resident_proc.terminate()
+        resident_proc.wait()
+
+def start_photo_normalization():
+    """Resizes photos copied at full resolution, at low priority, before the first timeout."""
+    global normalize_proc
+    normalize_proc = subprocess.Popen(["nice", "-n", "10", "python", NORMALIZE_SCRIPT])
+
+def connect_resident_slideshow():
+    """Connects to the resident slideshow and asks it to get the first slide ready."""
+    try:
+        client = ControlClient(CONTROL_SOCKET)
+        client.send("prepare")
+        return client
+    except socket.error:
+        return None
+
+def wait_for_es_exit(timeout):
+    """Waits until no EmulationStation process is left. Returns False on timeout."""
+    deadline = time.time() + timeout
+    while es_watcher.is_running():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def show_resident_slideshow(client, log):
+    """Shows the resident slideshow and blocks until it is exited. Returns False if unavailable."""
     try:
-        output = subprocess.check_output("ps w", shell=True)
-        # Python 2 compatibility
-        if hasattr(output, 'decode'):
-            output = output.decode('utf-8', 'ignore')
-        
-        for proc in GAME_PROCESSES:
-            if proc in output:
-                return True
-    except Exception:
-        pass
-    return False
+        reply = client.read_line(SHOW_TIMEOUT)
+        if reply == "prepared":
+            log.phase("slideshow_prepared")
+            client.send("show")
+            reply = client.read_line(SHOW_TIMEOUT)
+        if not reply or not reply.startswith("shown"):
+            sys.stdout.write("[WARNING] Resident slideshow did not answer, restarting it.\n")
+            stop_resident_slideshow()
+            return False
+        log.phase("first_frame")
+        # Blocks until the user exits ("hidden"), or the slideshow process dies
+        client.read_line()
+        log.phase("slideshow_session")
+        return True
+    except socket.error:
+        return False
+    finally:
+        client.close()
+
+def run_slideshow_process():
+    """Starts a new slideshow process and waits for it to exit."""
+    env = dict(os.environ, SLIDESHOW_LAUNCHED_AT=repr(time.time()))
+    # This call blocks until the slideshow is exited (by user input)
+    subprocess.call(["python", SLIDESHOW_SCRIPT] + SLIDESHOW_ARGS, env=env)
 
 def launch_screensaver():
-    """Manages the transition from EmulationStation to the Slideshow and back."""
+    """Manages the transition from EmulationStation to the Slideshow and back.
+
+    The resident slideshow prepares its first slide while EmulationStation
+    shuts down, and is shown as soon as ES has actually exited.
+    """
+    global es_start_proc
+    log = TransitionLog()
+    trace.log("screensaver")
+    if normalize_proc is not None and normalize_proc.poll() is None:
+        sys.stdout.write("\n[INFO] Photo normalization still running, large photos may load slowly.")
     sys.stdout.write("\n[INFO] Activity timeout. Stopping EmulationStation...\n")
     sys.stdout.flush()
     # Stop the UI to free up GPU and display resources
     subprocess.call(["killall", "emulationstation"])
-    time.sleep(2)
+    log.phase("es_signalled")
+
+    client = connect_resident_slideshow() if RESIDENT_SLIDESHOW else None
+
+    if not wait_for_es_exit(ES_STOP_TIMEOUT):
+        sys.stdout.write("[WARNING] EmulationStation still running, killing it.\n")
+        subprocess.call(["killall", "-9", "emulationstation"])
+        wait_for_es_exit(1)
+    log.phase("es_stopped")
 
     sys.stdout.write("[INFO] Starting Slideshow...\n")
     sys.stdout.flush()
-    # This call blocks until the slideshow is exited (by user input)
-    subprocess.call(["python", SLIDESHOW_SCRIPT])
+    if not (client and show_resident_slideshow(client, log)):
+        sys.stdout.write("[INFO] Cold-starting the slideshow process.\n")
+        sys.stdout.flush()
+        run_slideshow_process()
+        log.phase("slideshow_cold_session")
 
     sys.stdout.write("[INFO] Relancing EmulationStation...\n")
     sys.stdout.flush()
-    # Restart the UI
-    subprocess.call([ES_START_SCRIPT, "start"])
+    # Restart the UI in the background, the monitor goes back to watching input right away
+    if es_start_proc is not None:
+        es_start_proc.poll()
+    es_start_proc = subprocess.Popen([ES_START_SCRIPT, "start"])
+    log.phase("es_restart_spawned")
+    if RESIDENT_SLIDESHOW:
+        start_resident_slideshow()
+    log.total("transition_total")
 
 def main():
     print("--- Recalbox Idle Monitor Started (CTRL+C to quit) ---")
     last_activity = time.time()
+    check_interval = CHECK_INTERVAL
+    game_running = False
+    if NORMALIZE_PHOTOS and os.path.exists(NORMALIZE_SCRIPT):
+        start_photo_normalization()
+    if RESIDENT_SLIDESHOW:
+        start_resident_slideshow()
     
-    # Set up non-blocking reads for all input devices
-    devices = get_input_devices()
-    files = []
-    for dev in devices:
-        try:
-            f = open(dev, 'rb')
-            fd = f.fileno()
-            # Set O_NONBLOCK flag
-            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
-            files.append(f)
-        except Exception:
-            pass
-
-    if not files:
+    # Wait on all input devices at once (hot-plugged devices are picked up too)
+    reader = InputReader()
+    if not reader.devices:
         print("[WARNING] No input devices found. Monitor may not work as expected.")
+    trace.log("monitoring", len(reader.devices))
 
     try:
         while True:
-            activity = False
-            # Check all opened devices for any input data
-            for f in files:
-                try:
-                    # Reading a small chunk to check for activity
-                    if f.read(16):
-                        activity = True
-                except Exception:
-                    # No data available (Expected in non-blocking mode)
-                    pass
+            # Block until input arrives or the next check/timeout is due
+            remain_s = TIMEOUT_SECONDS - (time.time() - last_activity)
+            activity = bool(reader.wait(max(0, min(check_interval, remain_s))))
 
             current = time.time()
             if activity:
                 last_activity = current
+                check_interval = CHECK_INTERVAL
+                trace.log("activity")
                 sys.stdout.write("\r[ACTIVITY] Input detected. Timer reset.             ")
                 sys.stdout.flush()
+                time.sleep(ACTIVITY_HOLDOFF)
+                reader.drain()
             elif is_game_running():
                 # Don't start screensaver if a game is running
                 last_activity = current
+                game_running = True
+                check_interval = min(GAME_CHECK_INTERVAL, check_interval * 2)
                 sys.stdout.write("\r[INFO] Game running. Monitoring paused.           ")
                 sys.stdout.flush()
             else:
+                if game_running:
+                    # The game just ended: the countdown starts again at the normal pace
+                    game_running = False
+                    check_interval = CHECK_INTERVAL
+                else:
+                    check_interval = min(IDLE_CHECK_INTERVAL, check_interval * 2)
                 elapsed = current - last_activity
                 remain = int(TIMEOUT_SECONDS - elapsed)
                 if remain <= 0:
                     launch_screensaver()
-                    # Reset timer after returning from slideshow
+                    # Discard the input the slideshow consumed, then reset the timer
+                    reader.drain()
                     last_activity = time.time()
+                    check_interval = CHECK_INTERVAL
                 else:
                     sys.stdout.write("\r[IDLE] Starting slideshow in %02d seconds...        " % remain)
                     sys.stdout.flush()
-            
-            time.sleep(0.5) # Check twice per second to save CPU
-            
+
     except KeyboardInterrupt:
         print("\n[INFO] Monitor stopped by user.")
     finally:
-        for f in files:
-            f.close()
+        reader.close()
+        stop_resident_slideshow()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import glob
+import errno
+import fcntl
+import select
+import struct
+import time
+
+# struct input_event: timeval (2 x long), type, code, value
+EVENT_FORMAT = 'llHHi'
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+# Overridable so benchmarks and input replays can point at fake devices
+DEVICE_PATTERN = os.environ.get("SLIDESHOW_INPUT_GLOB", '/dev/input/event*')
+
+# Events read per os.read() call
+READ_BATCH = 64
+
+# Hot-plug fallback when inotify is unavailable: how often /dev/input is re-checked
+RESCAN_INTERVAL = 2.0
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+
+def open_inotify(path):
+    """Returns a non-blocking inotify fd watching path, or None if unsupported."""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, path.encode('utf-8'), IN_CREATE | IN_ATTRIB | IN_DELETE) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception:
+        return None
+
+
+def decode_events(data):
+    """Decodes a buffer of raw input_event records into (type, code, value) tuples."""
+    events = []
+    for offset in range(0, len(data) - EVENT_SIZE + 1, EVENT_SIZE):
+        _, _, ev_type, ev_code, ev_value = struct.unpack_from(EVENT_FORMAT, data, offset)
+        events.append((ev_type, ev_code, ev_value))
+    return events
+
+
+class InputReader(object):
+    """Blocks on every input event device at once until an event arrives."""
+
+    def __init__(self, pattern=DEVICE_PATTERN):
+        self.pattern = pattern
+        self.devices = {}  # fd -> device path
+        self._watch_dir = os.path.dirname(pattern)
+        self._dir_mtime = None
+        self._next_rescan = 0
+        self._epoll = select.epoll() if hasattr(select, 'epoll') else None
+        self._inotify_fd = open_inotify(self._watch_dir)
+        if self._inotify_fd is not None:
+            self._register(self._inotify_fd)
+        self.rescan()
+
+    def _register(self, fd):
+        if self._epoll:
+            self._epoll.register(fd, select.EPOLLIN)
+
+    def _unregister(self, fd):
+        if self._epoll:
+            try:
+                self._epoll.unregister(fd)
+            except Exception:
+                pass
+
+    def rescan(self):
+        """Opens devices that appeared since the last scan."""
+        try:
+            mtime = os.stat(self._watch_dir).st_mtime
+        except OSError:
+            return
+        self._dir_mtime = mtime
+        known = set(self.devices.values())
+        for path in glob.glob(self.pattern):
+            if path in known:
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                continue
+            flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+            fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+            self.devices[fd] = path
+            self._register(fd)
+
+    def _close_device(self, fd):
+        self._unregister(fd)
+        self.devices.pop(fd, None)
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+    def _read_device(self, fd):
+        events = []
+        while True:
+            try:
+                data = os.read(fd, EVENT_SIZE * READ_BATCH)
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    # ENODEV: the device was unplugged
+                    self._close_device(fd)
+                break
+            if not data:
+                break
+            events.extend(decode_events(data))
+            if len(data) < EVENT_SIZE * READ_BATCH:
+                break
+        return events
+
+    def _drain_inotify(self):
+        try:
+            while os.read(self._inotify_fd, 4096):
+                pass
+        except OSError:
+            pass
+
+    def _poll(self, timeout):
+        if self._epoll:
+            try:
+                return [fd for fd, _ in self._epoll.poll(timeout)]
+            except IOError as e:
+                if e.errno == errno.EINTR:
+                    return []
+                raise
+        fds = list(self.devices)
+        if self._inotify_fd is not None:
+            fds.append(self._inotify_fd)
+        if not fds:
+            time.sleep(timeout)
+            return []
+        try:
+            return select.select(fds, [], [], timeout)[0]
+        except select.error:
+            return []
+
+    def wait(self, timeout):
+        """Returns the pending (type, code, value) events, waiting at most timeout seconds."""
+        if self._inotify_fd is None:
+            now = time.time()
+            if now >= self._next_rescan:
+                self._next_rescan = now + RESCAN_INTERVAL
+                try:
+                    if os.stat(self._watch_dir).st_mtime != self._dir_mtime:
+                        self.rescan()
+                except OSError:
+                    pass
+            timeout = min(timeout, max(0, self._next_rescan - now))
+        events = []
+        for fd in self._poll(max(0, timeout)):
+            if fd == self._inotify_fd:
+                self._drain_inotify()
+                self.rescan()
+            elif fd in self.devices:
+                events.extend(self._read_device(fd))
+        return events
+
+    def drain(self):
+        """Discards everything queued on the devices (e.g. input read by a child process)."""
+        for fd in list(self.devices):
+            self._read_device(fd)
+
+    def close(self):
+        for fd in list(self.devices):
+            self._close_device(fd)
+        if self._inotify_fd is not None:
+            self._unregister(self._inotify_fd)
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+        if self._epoll:
+            self._epoll.close()
+            self._epoll = None
@@ -0,0 +1,488 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Records button presses on the cabinet and replays them to measure input latency.
+
+record: saves the /dev/input/event* streams, with their timing, to a trace file.
+replay: feeds a trace to slideshow.py (or to idle_monitor.py, which then starts
+the slideshow) through FIFOs standing in for the devices, on generated media
+under SDL's dummy driver. Both scripts log their actions to SLIDESHOW_TRACE;
+each action is matched with the press that caused it and the latency
+distributions are printed as JSON:
+
+    python input_replay.py record cabinet.trace          # press buttons, then Ctrl+C
+    python input_replay.py replay cabinet.trace -o latency.json
+    python input_replay.py synth demo.trace && python input_replay.py replay demo.trace
+"""
+import os
+import sys
+import json
+import glob
+import time
+import fcntl
+import shutil
+import signal
+import struct
+import bisect
+import select
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from input_reader import InputReader, DEVICE_PATTERN, EVENT_FORMAT, EVENT_SIZE, READ_BATCH
+from profiler import TRACE_ENV, summarize
+
+TRACE_VERSION = 1
+
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+ABS_X = 0
+ABS_Y = 1
+ABS_HAT0X = 16
+ABS_HAT0Y = 17
+
+# Set (to the JSON config) in the slideshow started by a replay
+CHILD_ENV = "SLIDESHOW_REPLAY_CHILD"
+
+# Stick deflection counted as a press, as in slideshow.py
+STICK_THRESHOLD = 0.6
+
+# An action more than this long after the last press wasn't caused by it
+MATCH_WINDOW = 2.0
+
+# Seconds to wait for the target to be ready, and to let it react to the last event
+READY_TIMEOUT = 30.0
+TAIL = 2.0
+
+# Trace lines that are not the answer to a press
+NOT_ACTIONS = ("input", "frame", "shown", "session_end", "monitoring")
+
+
+def _ioc_read(nr, size):
+    return (2 << 30) | (size << 16) | (ord('E') << 8) | nr
+
+
+def device_info(fd, path):
+    """Name and stick ranges of an evdev device (EVIOCGNAME, EVIOCGABS)."""
+    info = {"path": path, "name": os.path.basename(path), "axes": {}}
+    try:
+        name = fcntl.ioctl(fd, _ioc_read(0x06, 256), b"\0" * 256)
+        info["name"] = name.split(b"\0", 1)[0].decode('utf-8', 'replace')
+    except (IOError, OSError):
+        pass
+    for code in (ABS_X, ABS_Y):
+        try:
+            _, lo, hi, _, _, _ = struct.unpack('6i', fcntl.ioctl(fd, _ioc_read(0x40 + code, 24), b"\0" * 24))
+        except (IOError, OSError):
+            continue
+        if hi > lo:
+            info["axes"][str(code)] = [lo, hi]
+    return info
+
+
+def record(out_path, duration, pattern):
+    fds = {}
+    devices = []
+    for path in sorted(glob.glob(pattern)):
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError as e:
+            print("[WARNING] Cannot open %s: %s" % (path, e))
+            continue
+        fds[fd] = len(devices)
+        devices.append(device_info(fd, path))
+    if not fds:
+        print("[WARNING] No input device matches %s" % pattern)
+        return 1
+    print("[REPLAY] Recording %s, Ctrl+C to stop" % ", ".join(d["name"] for d in devices))
+    count = 0
+    start = None
+    deadline = time.time() + duration if duration else None
+    with open(out_path, 'w') as f:
+        f.write(json.dumps({"version": TRACE_VERSION, "recorded": int(time.time()), "devices": devices}) + "\n")
+        try:
+            while deadline is None or time.time() < deadline:
+                for fd in select.select(list(fds), [], [], 0.5)[0]:
+                    try:
+                        data = os.read(fd, EVENT_SIZE * READ_BATCH)
+                    except OSError:
+                        continue
+                    for offset in range(0, len(data) - EVENT_SIZE + 1, EVENT_SIZE):
+                        sec, usec, ev_type, ev_code, ev_value = struct.unpack_from(EVENT_FORMAT, data, offset)
+                        # Kernel timestamps: the original timing, whatever our own scheduling delays
+                        t = sec + usec / 1e6
+                        if start is None: start = t
+                        f.write(json.dumps([round(t - start, 6), fds[fd], ev_type, ev_code, ev_value]) + "\n")
+                        count += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+    print("[REPLAY] %d events recorded in %s" % (count, out_path))
+    return 0
+
+
+def synth(out_path, start, info_code, mode_code, exit_code):
+    """Writes a scripted session: info, fast d-pad taps (debounce), stick, mode changes, exit."""
+    events = []
+
+    def key(t, code):
+        events.extend([[t, 0, EV_KEY, code, 1], [t, 0, EV_SYN, 0, 0],
+                       [t + 0.08, 0, EV_KEY, code, 0], [t + 0.08, 0, EV_SYN, 0, 0]])
+
+    def axis(t, code, value, rest, hold=0.06):
+        events.extend([[t, 0, EV_ABS, code, value], [t, 0, EV_SYN, 0, 0],
+                       [t + hold, 0, EV_ABS, code, rest], [t + hold, 0, EV_SYN, 0, 0]])
+
+    t = start
+    key(t, info_code); key(t + 2.0, info_code)
+    t += 3.0
+    for i in range(6):
+        axis(t + i * 0.15, ABS_HAT0X, 1, 0)  # next photo: 0.4 s debounce
+    t += 2.0
+    for i in range(6):
+        axis(t + i * 0.1, ABS_HAT0Y, -1, 0)  # faster: 0.2 s debounce
+    t += 2.0
+    axis(t, ABS_X, 255, 128, hold=0.3)
+    t += 2.0
+    for i in range(4):
+        key(t + i * 1.5, mode_code)  # photos -> videos -> games -> cycle -> photos
+    t += 7.0
+    key(t, exit_code)
+    events.sort(key=lambda e: e[0])
+    device = {"path": "synthetic", "name": "synthetic pad", "axes": {str(ABS_X): [0, 255], str(ABS_Y): [0, 255]}}
+    with open(out_path, 'w') as f:
+        f.write(json.dumps({"version": TRACE_VERSION, "recorded": int(time.time()), "devices": [device]}) + "\n")
+        for event in events:
+            f.write(json.dumps([round(event[0], 6)] + event[1:]) + "\n")
+    print("[REPLAY] %d events written to %s" % (len(events), out_path))
+    return 0
+
+
+def load_trace(path):
+    with open(path) as f:
+        header = json.loads(f.readline())
+        events = [json.loads(line) for line in f if line.strip()]
+    return header, events
+
+
+def press_label(event, axes, state):
+    """Names the press an event starts ("key 304", "hat", "stick"), or None."""
+    _, dev, ev_type, ev_code, ev_value = event
+    if ev_type == EV_KEY:
+        return "key %d" % ev_code if ev_value == 1 else None
+    if ev_type != EV_ABS:
+        return None
+    if ev_code in (ABS_HAT0X, ABS_HAT0Y):
+        return "hat" if ev_value else None
+    bounds = axes.get(str(ev_code))
+    if ev_code not in (ABS_X, ABS_Y) or not bounds:
+        return None
+    value = 2.0 * (ev_value - bounds[0]) / max(1, bounds[1] - bounds[0]) - 1.0
+    pushed = abs(value) > STICK_THRESHOLD
+    was_pushed, state[(dev, ev_code)] = state.get((dev, ev_code), False), pushed
+    return "stick" if pushed and not was_pushed else None
+
+
+def read_actions(path):
+    actions = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split(None, 2)
+                if len(parts) >= 2:
+                    actions.append((float(parts[0]), parts[1], parts[2].strip() if len(parts) > 2 else ""))
+    except (IOError, OSError):
+        pass
+    return actions
+
+
+def wait_for_action(path, name, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if any(action == name for _, action, _ in read_actions(path)):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def analyze(presses, actions):
+    """Matches every action with the last press before it; returns the latency report (ms)."""
+    press_times = [t for t, _ in presses]
+    by_action = {}
+    by_input = {}
+    read_ms = []
+    answered = set()
+    for _, label in presses:
+        by_input.setdefault(label, {"presses": 0, "actions": 0})["presses"] += 1
+    last_input = None
+    for i, (t, action, detail) in enumerate(actions):
+        k = bisect.bisect_right(press_times, t) - 1
+        if k < 0 or t - press_times[k] > MATCH_WINDOW:
+            continue
+        if action == "input":
+            if last_input != k:
+                read_ms.append((t - press_times[k]) * 1000.0)
+                last_input = k
+            continue
+        if action in NOT_ACTIONS:
+            continue
+        entry = by_action.setdefault(action, {"action": [], "screen": []})
+        entry["action"].append((t - press_times[k]) * 1000.0)
+        if k not in answered:
+            answered.add(k)
+            by_input[presses[k][1]]["actions"] += 1
+        # What the user sees: the next frame, or the slideshow gone after an exit
+        for t2, later, _ in actions[i + 1:]:
+            if later in ("frame", "session_end"):
+                entry["screen"].append((t2 - press_times[k]) * 1000.0)
+                break
+    report = {
+        "presses": len(presses),
+        "unanswered": len(presses) - len(answered),
+        "read_ms": summarize(read_ms),
+        "by_input": by_input,
+        "actions": {},
+    }
+    for action, entry in sorted(by_action.items()):
+        report["actions"][action] = {"action_ms": summarize(entry["action"])}
+        if entry["screen"]:
+            report["actions"][action]["screen_ms"] = summarize(entry["screen"])
+    return report
+
+
+def make_stub(bin_dir, name, body="exit 0"):
+    path = os.path.join(bin_dir, name)
+    with open(path, 'w') as f:
+        f.write("#!/bin/sh\n%s\n" % body)
+    os.chmod(path, 0o755)
+    return path
+
+
+def replay(args):
+    import bench_slideshow
+    import slideshow
+    header, events = load_trace(args.trace)
+    if not events:
+        print("[WARNING] Empty trace %s" % args.trace)
+        return 1
+    workdir = tempfile.mkdtemp(prefix="slideshow_replay_")
+    bin_dir = os.path.join(workdir, "bin")
+    input_dir = os.path.join(workdir, "input")
+    actions_path = os.path.join(workdir, "actions.log")
+    duration = events[-1][0] / args.speed + TAIL
+    cfg = {
+        "photos": args.photos or os.path.join(workdir, "images"),
+        "videos": os.path.join(workdir, "videos"),
+        "roms": os.path.join(workdir, "roms"),
+        "settings": os.path.join(workdir, "slideshow_settings.json"),
+        "index": os.path.join(workdir, "media_index.json"),
+        "gamelists": os.path.join(workdir, "gamelist_index.json"),
+        "pixel_cache": os.path.join(workdir, "cache"),
+        "cycle_interval": slideshow.CYCLE_INTERVAL,
+        "duration": duration + (args.idle_timeout if args.target == "monitor" else 0) + READY_TIMEOUT,
+        "args": {"enable_animation": not args.no_animation},
+    }
+    writers = []
+    proc = None
+    try:
+        if not args.photos:
+            import pygame
+            pygame.init()
+            bench_slideshow.make_photos(cfg["photos"], 20, (1280, 720))
+        bench_slideshow.make_videos(cfg["videos"], 4)
+        bench_slideshow.make_roms_tree(cfg["roms"], 50)
+        bench_slideshow.make_omxplayer_stub(bin_dir, 2.0)
+        make_stub(bin_dir, "killall")
+        os.symlink(sys.executable, os.path.join(bin_dir, "python"))
+        # The cabinet's settings, so the recorded button codes mean the same thing
+        settings_path = args.settings or slideshow.SETTINGS_FILE
+        if os.path.exists(settings_path):
+            shutil.copyfile(settings_path, cfg["settings"])
+
+        # One FIFO per recorded device. Kept open for writing until the end:
+        # once its last writer closes, a FIFO polls as hung up and the reader would spin.
+        os.makedirs(input_dir)
+        axes = {}
+        for i, device in enumerate(header["devices"]):
+            path = os.path.join(input_dir, "event%d" % i)
+            os.mkfifo(path)
+            writers.append(os.open(path, os.O_RDWR | os.O_NONBLOCK))
+            for code, bounds in device.get("axes", {}).items():
+                axes.setdefault(code, bounds)
+
+        env = dict(os.environ)
+        env.update({
+            "SDL_VIDEODRIVER": "dummy",
+            "SDL_AUDIODRIVER": "dummy",
+            "SLIDESHOW_INPUT_GLOB": os.path.join(input_dir, "event*"),
+            "SLIDESHOW_FB_BLANK": os.path.join(workdir, "fb_blank"),
+            "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+            TRACE_ENV: actions_path,
+            CHILD_ENV: json.dumps(dict(cfg, axes=axes)),
+        })
+        if args.target == "monitor":
+            cfg_monitor = {"idle_timeout": args.idle_timeout, "es_start": make_stub(bin_dir, "emulationstation_start")}
+            cmd = [sys.executable, os.path.abspath(__file__), "monitor-child", json.dumps(cfg_monitor)]
+            ready = "monitoring"
+        else:
+            cmd = [sys.executable, os.path.abspath(__file__)]
+            ready = "shown"
+        proc = subprocess.Popen(cmd, env=env, preexec_fn=os.setsid, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, universal_newlines=True)
+        if not wait_for_action(actions_path, ready, READY_TIMEOUT):
+            print("[WARNING] %s not ready after %ds" % (args.target, READY_TIMEOUT))
+            return 1
+
+        sys.stderr.write("[REPLAY] Replaying %d events (%.1fs) into %s\n" % (len(events), duration - TAIL, args.target))
+        presses = []
+        stick_state = {}
+        start = time.time()
+        for event in events:
+            delay = start + event[0] / args.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.time()
+            sec = int(now)
+            os.write(writers[event[1]], struct.pack(EVENT_FORMAT, sec, int((now - sec) * 1e6), event[2], event[3], event[4]))
+            label = press_label(event, axes, stick_state)
+            if label:
+                presses.append((now, label))
+        time.sleep(TAIL)
+    finally:
+        if proc is not None:
+            if proc.poll() is None:
+                try:
+                    # SIGINT ends the monitor's loop (KeyboardInterrupt) and the slideshow it started
+                    os.killpg(proc.pid, signal.SIGINT)
+                except OSError:
+                    pass
+            output = proc.communicate()[0]
+            if args.verbose:
+                sys.stderr.write(output)
+        for fd in writers:
+            os.close(fd)
+        actions = read_actions(actions_path)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = analyze(presses, actions)
+    report.update(trace=os.path.basename(args.trace), target=args.target, speed=args.speed)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    return 0
+
+
+class JoystickBridge(object):
+    """Turns replayed stick and d-pad evdev events into the pygame events SDL would post."""
+
+    def __init__(self, axes):
+        self.axes = dict((int(code), bounds) for code, bounds in axes.items())
+        self.hat = [0, 0]
+
+    def post(self, events):
+        import pygame
+        for ev_type, ev_code, ev_value in events:
+            if ev_type != EV_ABS:
+                continue
+            if ev_code in (ABS_HAT0X, ABS_HAT0Y):
+                # evdev counts the hat downwards, SDL upwards
+                if ev_code == ABS_HAT0X: self.hat[0] = ev_value
+                else: self.hat[1] = -ev_value
+                pygame.event.post(pygame.event.Event(pygame.JOYHATMOTION, joy=0, instance_id=0, hat=0, value=tuple(self.hat)))
+            elif ev_code in (ABS_X, ABS_Y) and ev_code in self.axes:
+                lo, hi = self.axes[ev_code]
+                value = 2.0 * (ev_value - lo) / max(1, hi - lo) - 1.0
+                pygame.event.post(pygame.event.Event(pygame.JOYAXISMOTION, joy=0, instance_id=0, axis=ev_code, value=value))
+
+
+class BridgedInputReader(InputReader):
+    """The slideshow's InputReader, also posting what it reads through a JoystickBridge.
+
+    SDL only reads the real devices, so without it the replayed d-pad and
+    stick would never reach the slideshow's joystick handling.
+    """
+
+    bridge = None
+
+    def wait(self, timeout):
+        events = InputReader.wait(self, timeout)
+        if events and self.bridge:
+            self.bridge.post(events)
+        return events
+
+
+def run_slideshow_child(cfg):
+    import bench_slideshow
+    import slideshow
+    BridgedInputReader.bridge = JoystickBridge(cfg.get("axes", {}))
+    slideshow.InputReader = BridgedInputReader
+    bench_slideshow.run_child(cfg)
+
+
+def run_monitor_child(cfg):
+    import idle_monitor
+    idle_monitor.TIMEOUT_SECONDS = cfg["idle_timeout"]
+    idle_monitor.SLIDESHOW_SCRIPT = os.path.abspath(__file__)
+    idle_monitor.SLIDESHOW_ARGS = []
+    idle_monitor.ES_START_SCRIPT = cfg["es_start"]
+    idle_monitor.RESIDENT_SLIDESHOW = False
+    idle_monitor.NORMALIZE_PHOTOS = False
+    idle_monitor.main()
+
+
+def main():
+    # Started by a replay, directly or as SLIDESHOW_SCRIPT by the idle monitor
+    if len(sys.argv) == 1 and os.environ.get(CHILD_ENV):
+        run_slideshow_child(json.loads(os.environ[CHILD_ENV]))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Record input on the cabinet and replay it to measure latency.")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("record", help="record the input devices to a trace file")
+    p.add_argument("trace")
+    p.add_argument("--duration", type=float, help="stop after this many seconds (default: Ctrl+C)")
+    p.add_argument("--devices", default=DEVICE_PATTERN, help="device glob (default %(default)s)")
+    p = sub.add_parser("synth", help="write a scripted trace, for machines without the cabinet's pads")
+    p.add_argument("trace")
+    p.add_argument("--start", type=float, default=1.0, help="seconds before the first press")
+    p = sub.add_parser("replay", help="replay a trace and report the latencies")
+    p.add_argument("trace")
+    p.add_argument("--target", choices=("slideshow", "monitor"), default="slideshow",
+                   help="monitor: the idle monitor starts the slideshow after --idle-timeout")
+    p.add_argument("--idle-timeout", type=float, default=3.0)
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    p.add_argument("--settings", help="slideshow settings with the button codes (default: the installed ones)")
+    p.add_argument("--photos", help="photo folder (default: generated)")
+    p.add_argument("--no-animation", action="store_true")
+    p.add_argument("-o", "--output", help="also write the JSON report to this file")
+    p.add_argument("--keep", action="store_true", help="keep the work folder")
+    p.add_argument("-v", "--verbose", action="store_true", help="show the target's output")
+    p = sub.add_parser("monitor-child")
+    p.add_argument("config")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        return record(args.trace, args.duration, args.devices)
+    if args.command == "synth":
+        import slideshow
+        return synth(args.trace, args.start, slideshow.INFO_BUTTON_DEFAULT, slideshow.MODE_BUTTON_DEFAULT,
+                     slideshow.MODE_BUTTON_DEFAULT + 1)
+    if args.command == "replay":
+        return replay(args)
+    if args.command == "monitor-child":
+        run_monitor_child(json.loads(args.config))
+        return 0
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
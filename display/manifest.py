@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import json
+
+# Written by the selector (index.js) next to the media it copies
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+FIELDS = ("label", "info", "source_path")
+
+
+class MetadataManifest(object):
+    """Labels of the media folders, read from one manifest file per folder.
+
+    Replaces opening a .txt sidecar per slide, which is slow on an SD card or
+    an SMB share. Files the manifest doesn't cover return None so the caller
+    can fall back to their sidecar.
+    """
+
+    def __init__(self, folders):
+        self.folders = list(folders)
+        self.entries = {}  # folder -> {filename: {label, info, source_path}}
+        self._mtimes = {}
+
+    def refresh(self):
+        """(Re)loads the manifests that changed since the last call: one stat() per folder."""
+        for folder in self.folders:
+            path = os.path.join(folder, MANIFEST_NAME)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self.entries.pop(folder, None)
+                self._mtimes.pop(folder, None)
+                continue
+            if self._mtimes.get(folder) == mtime:
+                continue
+            self._mtimes[folder] = mtime
+            self.entries[folder] = self._load(path)
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8', 'ignore'))
+            if data.get("version") != MANIFEST_VERSION:
+                return {}
+            files = {}
+            for name, entry in data.get("files", {}).items():
+                files[name] = dict((field, entry.get(field) or u"") for field in FIELDS)
+            return files
+        except Exception as e:
+            print("[WARNING] Cannot read %s: %s" % (path, e))
+            return {}
+
+    def get(self, file_path):
+        """Returns a copy of the entry of file_path, or None if no manifest lists it."""
+        files = self.entries.get(os.path.dirname(file_path))
+        entry = files.get(os.path.basename(file_path)) if files else None
+        return dict(entry) if entry is not None else None
+
+    def __len__(self):
+        return sum(len(files) for files in self.entries.values())
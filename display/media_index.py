@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import threading
+
+INDEX_VERSION = 1
+
+# Photos of the slideshow folder (index.js writes .jpg); normalize_photos.py
+# only processes these, so nothing is resized that would never be shown
+PHOTO_EXTENSIONS = ('.jpg',)
+
+
+def write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp_path, path)
+
+
+class MediaIndex(object):
+    """On-disk index of the slideshow media folders, refreshed from directory mtimes.
+
+    Each indexed tree stores, per directory, its mtime, its subdirectories and
+    its matching files. A refresh only lists directories whose mtime changed,
+    so an unchanged ROMs tree costs one stat() per directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.collections = {}  # key -> (top, extensions, recursive, dir_filter)
+        self.trees = {}  # top -> {dirpath: [mtime, subdirs, files]}
+        self.listed_dirs = 0
+        self.refreshed_at = 0
+        self._files = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_collection(self, key, top, extensions, recursive=False, dir_filter=None):
+        self.collections[key] = (top, tuple(extensions), recursive, dir_filter)
+
+    def load(self):
+        """Loads the saved index; returns False if there is none (or it is unusable)."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return False
+            self.trees = data.get("trees", {})
+            self.refreshed_at = data.get("refreshed_at", 0)
+        except Exception:
+            return False
+        self._files = {}
+        return True
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "refreshed_at": self.refreshed_at, "trees": self.trees}
+        try:
+            write_json_atomic(self.path, data)
+        except Exception:
+            pass
+
+    def _refresh_tree(self, top, extensions, recursive, dir_filter, full):
+        old = {} if full else self.trees.get(top, {})
+        tree = {}
+        stack = [top]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                mtime = os.stat(dirpath).st_mtime
+            except OSError:
+                continue
+            entry = old.get(dirpath)
+            if entry and entry[0] == mtime:
+                subdirs, files = entry[1], entry[2]
+            else:
+                subdirs, files = [], []
+                keep_files = dir_filter is None or dir_filter(dirpath)
+                try:
+                    names = os.listdir(dirpath)
+                except OSError:
+                    names = []
+                for name in names:
+                    if name.lower().endswith(extensions):
+                        if keep_files:
+                            files.append(name)
+                    elif recursive and os.path.isdir(os.path.join(dirpath, name)):
+                        subdirs.append(name)
+                self.listed_dirs += 1
+            tree[dirpath] = [mtime, subdirs, files]
+            if recursive:
+                stack.extend(os.path.join(dirpath, name) for name in subdirs)
+        return tree
+
+    def refresh(self, full=False):
+        """Brings every collection up to date with the disk, then saves the index."""
+        self.listed_dirs = 0
+        trees = {}
+        for top, extensions, recursive, dir_filter in self.collections.values():
+            trees[top] = self._refresh_tree(top, extensions, recursive, dir_filter, full)
+        with self._lock:
+            self.trees = trees
+            self._files = {}
+        self.refreshed_at = time.time()
+        self.save()
+
+    def refresh_in_background(self):
+        """Refreshes the index off the caller's thread, unless a refresh is still running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.refresh)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def files(self, key):
+        """Returns the sorted file list of a collection from memory."""
+        with self._lock:
+            if key not in self._files:
+                top = self.collections[key][0]
+                paths = []
+                for dirpath, entry in self.trees.get(top, {}).items():
+                    paths.extend(os.path.join(dirpath, name) for name in entry[2])
+                self._files[key] = sorted(paths)
+            return self._files[key]
+
+    def stats(self):
+        out = {}
+        for key, (top, _, _, _) in self.collections.items():
+            out[key] = {"folder": top, "dirs": len(self.trees.get(top, {})), "files": len(self.files(key))}
+        return out
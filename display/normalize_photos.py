@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Downscales oversized photos of the slideshow folder to the screen resolution.
+
+Photos copied straight from a phone (12-48 MP) take seconds to decode on the
+Pi. This resizes them in place, on every core, keeping their name so the .txt
+sidecar and manifest entry still match. Already processed files are skipped
+from their size and mtime, so it is cheap to run at every boot:
+
+    python normalize_photos.py            # uses the framebuffer resolution
+    python normalize_photos.py --size 1280x1024 --originals /recalbox/share/originals
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+import multiprocessing
+
+from media_index import write_json_atomic, PHOTO_EXTENSIONS
+
+# Same folder as slideshow.py
+IMAGE_FOLDER = "/recalbox/share/userscripts/slideshow/images"
+
+STATE_FILE = ".normalized.json"
+WORK_DIR = ".normalize"
+
+FB_SIZE_FILE = "/sys/class/graphics/fb0/virtual_size"
+DEFAULT_SIZE = (1280, 1024)
+
+# SOFn markers carry the frame size (DHT, JPG and DAC share the range but don't)
+SOF_MARKERS = set(range(0xC0, 0xD0)) - set([0xC4, 0xC8, 0xCC])
+
+
+def jpeg_size(path):
+    """Reads (width, height) from the JPEG frame header without decoding, or None."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(2) != b'\xff\xd8':
+                return None
+            while True:
+                byte = f.read(1)
+                while byte and byte != b'\xff':
+                    byte = f.read(1)
+                while byte == b'\xff':
+                    byte = f.read(1)
+                if not byte:
+                    return None
+                marker = ord(byte)
+                if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                    continue  # standalone markers, no length
+                length = struct.unpack('>H', f.read(2))[0]
+                if marker in SOF_MARKERS:
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, 1)
+    except (IOError, OSError, struct.error):
+        return None
+
+
+def screen_size():
+    try:
+        with open(FB_SIZE_FILE) as f:
+            w, h = [int(v) for v in f.read().strip().split(",")]
+        if w > 0 and h > 0:
+            return w, h
+    except (IOError, OSError, ValueError):
+        pass
+    return DEFAULT_SIZE
+
+
+def available_memory():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def default_jobs(max_pixels):
+    """One worker per core, fewer if the largest photos wouldn't fit in memory together."""
+    jobs = multiprocessing.cpu_count()
+    memory = available_memory()
+    if memory and max_pixels:
+        # Decoded photo (up to 4 bytes per pixel) plus its working copy
+        jobs = min(jobs, max(1, int(memory * 0.7 // (max_pixels * 8))))
+    return jobs
+
+
+def fitted_size(size, limit):
+    ratio = min(float(limit[0]) / size[0], float(limit[1]) / size[1])
+    return max(1, int(size[0] * ratio)), max(1, int(size[1] * ratio))
+
+
+def normalize_one(job):
+    """Pool worker: resizes one photo in place. Returns (name, in_bytes, out_bytes, pixels, error)."""
+    folder, name, size, limit, originals = job
+    import pygame
+    path = os.path.join(folder, name)
+    in_bytes = os.path.getsize(path)
+    try:
+        img = pygame.image.load(path)
+        if img.get_bitsize() not in (24, 32):
+            # Greyscale JPEGs decode to 8 bits, smoothscale() needs 24/32
+            rgb = pygame.Surface(img.get_size(), 0, 24)
+            rgb.blit(img, (0, 0))
+            img = rgb
+        out = pygame.transform.smoothscale(img, fitted_size(img.get_size(), limit))
+        del img
+        # pygame picks the format from the extension; the work dir isn't indexed
+        tmp_path = os.path.join(folder, WORK_DIR, name)
+        pygame.image.save(out, tmp_path)
+        if originals:
+            shutil.move(path, os.path.join(originals, name))
+        os.rename(tmp_path, path)
+        return name, in_bytes, os.path.getsize(path), size[0] * size[1], None
+    except Exception as e:
+        return name, in_bytes, in_bytes, 0, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downscale oversized photos of the slideshow folder to the screen size.")
+    parser.add_argument("folder", nargs="?", default=IMAGE_FOLDER)
+    parser.add_argument("--size", help="target WxH (default: framebuffer size, else %dx%d)" % DEFAULT_SIZE)
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: cores, limited by free memory)")
+    parser.add_argument("--originals", help="move the original photos to this folder instead of replacing them")
+    parser.add_argument("--force", action="store_true", help="check every photo again")
+    args = parser.parse_args()
+
+    limit = tuple(int(v) for v in args.size.split("x")) if args.size else screen_size()
+    folder = args.folder
+    state_path = os.path.join(folder, STATE_FILE)
+    state = {}
+    if not args.force:
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            state = {}
+
+    start = time.time()
+    jobs, fitting, unreadable, new_state = [], 0, 0, {}
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(PHOTO_EXTENSIONS):
+            continue
+        path = os.path.join(folder, name)
+        st = os.stat(path)
+        stamp = [st.st_mtime, st.st_size]
+        if state.get(name) == stamp:
+            new_state[name] = stamp
+            continue
+        size = jpeg_size(path)
+        if size is None:
+            unreadable += 1
+        elif size[0] > limit[0] or size[1] > limit[1]:
+            jobs.append((folder, name, size, limit, args.originals))
+            continue
+        else:
+            fitting += 1
+        new_state[name] = stamp
+
+    resized = errors = pixels = in_total = out_total = 0
+    if jobs:
+        work_dir = os.path.join(folder, WORK_DIR)
+        if not os.path.isdir(work_dir):
+            os.makedirs(work_dir)
+        if args.originals and not os.path.isdir(args.originals):
+            os.makedirs(args.originals)
+        workers = args.jobs or default_jobs(max(size[0] * size[1] for _, _, size, _, _ in jobs))
+        print("[NORMALIZE] %d photos larger than %dx%d, %d workers" % (len(jobs), limit[0], limit[1], workers))
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        try:
+            for name, in_bytes, out_bytes, px, error in pool.imap_unordered(normalize_one, jobs):
+                if error:
+                    errors += 1
+                    print("[WARNING] Cannot resize %s: %s" % (name, error))
+                    continue
+                resized += 1
+                pixels += px; in_total += in_bytes; out_total += out_bytes
+                st = os.stat(os.path.join(folder, name))
+                new_state[name] = [st.st_mtime, st.st_size]
+        finally:
+            pool.close()
+            pool.join()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    write_json_atomic(state_path, new_state)
+    elapsed = time.time() - start
+    print("[NORMALIZE] %d resized, %d already fitting, %d skipped (done before), %d unreadable, %d errors in %.1fs"
+          % (resized, fitting, len(new_state) - resized - fitting - unreadable, unreadable, errors, elapsed))
+    if resized:
+        print("[NORMALIZE] %.2f photos/s, %.1f MP/s decoded, %.1f MB -> %.1f MB"
+              % (resized / elapsed, pixels / 1e6 / elapsed, in_total / 1048576.0, out_total / 1048576.0))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import mmap
+import struct
+import hashlib
+import threading
+import time
+
+import pygame
+
+from prefetch import load_fitted_image
+
+# Disk budget of the cache; least recently shown entries are deleted beyond it
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Entry header: magic, width, height, pitch, bitsize, R/G/B/A masks
+HEADER_FORMAT = '<4sIIIIIIII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b'SSPX'
+SUFFIX = '.px'
+
+# Layouts pygame.image.frombuffer() can map without copying
+FROMBUFFER_FORMATS = ("RGBX", "RGBA", "ARGB", "BGRA", "RGB", "BGR")
+
+# Used when the display doesn't report its format (e.g. dummy driver)
+FALLBACK_BITSIZE = 32
+FALLBACK_MASKS = (0xff0000, 0xff00, 0xff, 0)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8') if not isinstance(text, bytes) else text).hexdigest()[:16]
+
+
+def _data_view(mm, offset):
+    try:
+        return memoryview(mm)[offset:]
+    except TypeError:  # python 2: mmap only exposes the old buffer interface
+        return buffer(mm, offset)  # noqa: F821
+
+
+def _copy_into(surface, data):
+    """Copies raw pixels (same format and pitch) into surface."""
+    proxy = surface.get_buffer()
+    try:
+        memoryview(proxy)[:] = data
+    except TypeError:  # pygame 1.9: no buffer interface on BufferProxy
+        proxy.write(bytes(data), 0)
+
+
+def frombuffer_format(bitsize, masks):
+    """Returns the frombuffer() format producing surfaces with these masks, or None."""
+    for fmt in FROMBUFFER_FORMATS:
+        bytesize = 3 if fmt in ("RGB", "BGR") else 4
+        try:
+            probe = pygame.image.frombuffer(b'\0' * bytesize, (1, 1), fmt)
+        except (ValueError, pygame.error):
+            continue
+        if probe.get_bitsize() == bitsize and tuple(probe.get_masks()) == tuple(masks):
+            return fmt
+    return None
+
+
+class PixelCache(object):
+    """On-disk cache of photos already letterboxed and in the display's pixel format.
+
+    A hit memory-maps the entry instead of decoding and rescaling the JPEG.
+    When the layout matches a frombuffer() format the surface uses the mapping
+    directly (the surface keeps it alive). Otherwise the mapped pixels are copied
+    into a surface of the right format with a single memcpy.
+
+    Entries are keyed on source path, mtime, size, screen size and pixel format.
+    Storing a new version of a photo deletes the older ones.
+    """
+
+    def __init__(self, folder, screen_size, bitsize=None, masks=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = folder
+        self.screen_size = tuple(screen_size)
+        if bitsize not in (16, 24, 32) or not masks or not any(masks):
+            bitsize, masks = FALLBACK_BITSIZE, FALLBACK_MASKS
+        self.bitsize = bitsize
+        self.masks = tuple(int(m) for m in masks)
+        self.max_bytes = max_bytes
+        self.fmt = frombuffer_format(self.bitsize, self.masks)
+        self.hits = 0
+        self.misses = 0
+        self.zero_copy = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # file name -> [size, last use (the file mtime, touched on each hit)]
+        self._total = 0
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            for name in os.listdir(folder):
+                if name.endswith(SUFFIX):
+                    st = os.stat(os.path.join(folder, name))
+                    self._entries[name] = [st.st_size, st.st_mtime]
+                    self._total += st.st_size
+                elif name.endswith(".tmp"):
+                    os.remove(os.path.join(folder, name))
+        except OSError as e:
+            print("[WARNING] Pixel cache unavailable (%s): %s" % (folder, e))
+            self.folder = None
+
+    def _name(self, path):
+        st = os.stat(path)
+        key = "%s|%s|%s|%dx%d|%d|%s" % (path, st.st_mtime, st.st_size, self.screen_size[0], self.screen_size[1],
+                                        self.bitsize, self.masks)
+        return "%s_%s%s" % (_digest(path), _digest(key), SUFFIX)
+
+    def load(self, path, sw, sh):
+        """Drop-in replacement for load_fitted_image() going through the cache."""
+        if self.folder is None or (sw, sh) != self.screen_size:
+            return load_fitted_image(path, sw, sh)
+        name = self._name(path)
+        surface = self._read(name)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self._native(load_fitted_image(path, sw, sh))
+        self._write(name, surface)
+        return surface
+
+    def _native(self, image):
+        if image.get_bitsize() == self.bitsize and tuple(image.get_masks()) == self.masks:
+            return image
+        # blit() rather than convert(): works while a resident slideshow has no display
+        native = pygame.Surface(image.get_size(), 0, self.bitsize, self.masks)
+        native.blit(image, (0, 0))
+        return native
+
+    def _read(self, name):
+        entry_path = os.path.join(self.folder, name)
+        try:
+            with open(entry_path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            magic, w, h, pitch, bitsize, rm, gm, bm, am = struct.unpack_from(HEADER_FORMAT, mm, 0)
+            if magic != MAGIC or len(mm) != HEADER_SIZE + pitch * h or (bitsize, (rm, gm, bm, am)) != (self.bitsize, self.masks):
+                raise ValueError("corrupt entry")
+            if self.fmt and pitch == w * (bitsize // 8):
+                surface = pygame.image.frombuffer(_data_view(mm, HEADER_SIZE), (w, h), self.fmt)
+                self.zero_copy += 1
+            else:
+                surface = pygame.Surface((w, h), 0, bitsize, self.masks)
+                if surface.get_pitch() != pitch:
+                    raise ValueError("pitch mismatch")
+                _copy_into(surface, _data_view(mm, HEADER_SIZE))
+        except (ValueError, struct.error, pygame.error):
+            self._remove(name)
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries[name][1] = time.time()
+        try:
+            # The eviction order is rebuilt from the mtimes after a restart
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return surface
+
+    def _write(self, name, surface):
+        w, h = surface.get_size()
+        header = struct.pack(HEADER_FORMAT, MAGIC, w, h, surface.get_pitch(), self.bitsize, *self.masks)
+        entry_path = os.path.join(self.folder, name)
+        tmp_path = entry_path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(header)
+                f.write(surface.get_buffer().raw)
+            os.rename(tmp_path, entry_path)
+            size = os.path.getsize(entry_path)
+        except (IOError, OSError) as e:
+            print("[WARNING] Cannot write pixel cache entry: %s" % e)
+            return
+        prefix = name.split("_")[0] + "_"
+        with self._lock:
+            # Older versions of the same photo (source changed, other resolution)
+            stale = [n for n in self._entries if n.startswith(prefix) and n != name]
+            if name in self._entries:
+                self._total -= self._entries[name][0]
+            self._entries[name] = [size, time.time()]
+            self._total += size
+        for n in stale:
+            self._remove(n)
+        self._evict()
+
+    def _remove(self, name):
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry:
+                self._total -= entry[0]
+        try:
+            os.remove(os.path.join(self.folder, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return
+            by_age = sorted(self._entries.items(), key=lambda item: item[1][1])
+            victims = []
+            total = self._total
+            for name, (size, _) in by_age:
+                if total <= self.max_bytes:
+                    break
+                victims.append(name)
+                total -= size
+        for name in victims:
+            self._remove(name)
+
+    def stats(self):
+        return {"entries": len(self._entries), "mb": round(self._total / 1048576.0, 1), "hits": self.hits,
+                "misses": self.misses, "zero_copy": self.zero_copy, "format": self.fmt or "copy"}
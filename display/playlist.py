@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import random
+
+# Feistel rounds of the permutation; 4 is plenty to look shuffled
+ROUNDS = 4
+
+
+def _mix(value, key):
+    h = (value * 0x9E3779B1 + key) & 0xffffffff
+    h ^= h >> 15
+    h = (h * 0x85EBCA77) & 0xffffffff
+    h ^= h >> 13
+    return h
+
+
+class Playlist(object):
+    """Random play order over `size` items that is computed, never stored.
+
+    playlist[position] is the item to show at any (absolute, possibly
+    negative) position. Each run of `size` consecutive positions from a
+    multiple of `size` is a full permutation, so nothing repeats before the
+    whole set was shown; the next run is shuffled with another key, with its
+    first two items swapped if it would start on the item that ended the
+    previous run (two items simply alternate). Only the seed and the position
+    need saving to resume where it stopped.
+    """
+
+    def __init__(self, size, seed=None, position=0):
+        self.size = size
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.position = position
+        # Smallest even bit width covering size: the walk below takes < 4 steps on average
+        bits = max(2, (size - 1).bit_length() if size > 1 else 1)
+        bits += bits & 1
+        self._half = bits // 2
+        self._mask = (1 << self._half) - 1
+
+    @classmethod
+    def restore(cls, state, size):
+        """Resumes a saved playlist, or starts a new one if the library size changed (or the state is unusable)."""
+        if isinstance(state, dict) and state.get("size") == size:
+            try:
+                return cls(size, int(state["seed"]), int(state["position"]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return cls(size)
+
+    def state(self):
+        return {"size": self.size, "seed": self.seed, "position": self.position}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, position):
+        epoch, offset = divmod(position, self.size)
+        if self.size == 2:
+            return (self._shuffled(0, 0) + position) % 2
+        if offset < 2 and self.size > 2 and self._shuffled(epoch, 0) == self._shuffled(epoch - 1, self.size - 1):
+            # Never the same item twice in a row across two runs
+            offset = 1 - offset
+        return self._shuffled(epoch, offset)
+
+    def _shuffled(self, epoch, offset):
+        key = (self.seed + epoch * 0x61C88647) & 0xffffffff
+        # Cycle walking: permute the power-of-two domain until we land inside [0, size)
+        value = offset
+        while True:
+            value = self._permute(value, key)
+            if value < self.size:
+                return value
+
+    def _permute(self, value, key):
+        left, right = value >> self._half, value & self._mask
+        for r in range(ROUNDS):
+            left, right = right, left ^ (_mix(right, key + r) & self._mask)
+        return (left << self._half) | right
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import time
+
+TIER_ACTIVE = "active"
+TIER_DIM = "dim"
+TIER_BLANK = "blank"
+TIERS = (TIER_ACTIVE, TIER_DIM, TIER_BLANK)
+
+# fbdev blank interface; the env var points it elsewhere (e.g. a fake directory for tests)
+FB_BLANK_ENV = "SLIDESHOW_FB_BLANK"
+DEFAULT_FB_BLANK = "/sys/class/graphics/fb0/blank"
+FB_BLANK_ON = "1"  # FB_BLANK_NORMAL
+FB_BLANK_OFF = "0"  # FB_BLANK_UNBLANK
+
+
+def time_window(value):
+    """Checks a ["HH:MM", "HH:MM"] window (may cross midnight) and returns it."""
+    minutes_of_day(value[0]), minutes_of_day(value[1])
+    return [value[0], value[1]]
+
+
+def minutes_of_day(text):
+    hours, minutes = text.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("invalid time %r" % text)
+    return hours * 60 + minutes
+
+
+def in_window(window, now):
+    if not window:
+        return False
+    local = time.localtime(now)
+    current = local.tm_hour * 60 + local.tm_min
+    start, end = minutes_of_day(window[0]), minutes_of_day(window[1])
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def cpu_seconds():
+    t = os.times()
+    return t[0] + t[1]
+
+
+class PowerManager(object):
+    """Tiered idle policy of the slideshow.
+
+    active: normal rendering. dim: after dim_after seconds without input, or
+    inside the night window; the caller drops to a low frame rate without
+    zoom. blank: after blank_after seconds; the framebuffer is blanked
+    through fbdev and the caller stops drawing. Any input (activity()) brings
+    it back to active. Wall and CPU time are accounted per tier.
+    """
+
+    def __init__(self, dim_after, blank_after, window=None, blank_path=None):
+        self.dim_after = dim_after
+        self.blank_after = blank_after
+        self.window = window
+        self.blank_path = blank_path or os.environ.get(FB_BLANK_ENV, DEFAULT_FB_BLANK)
+        self.tier = TIER_ACTIVE
+        self.last_activity = time.time()
+        self.usage = dict((tier, [0.0, 0.0]) for tier in TIERS)  # tier -> [wall s, cpu s]
+        self._mark = (self.last_activity, cpu_seconds())
+        self._blanked = False
+
+    def activity(self, now):
+        self.last_activity = now
+
+    def target(self, now):
+        idle = now - self.last_activity
+        if self.blank_after and idle >= self.blank_after:
+            return TIER_BLANK
+        if (self.dim_after and idle >= self.dim_after) or in_window(self.window, now):
+            return TIER_DIM
+        return TIER_ACTIVE
+
+    def update(self, now):
+        """Moves to the tier due at `now` and returns it."""
+        tier = self.target(now)
+        if tier != self.tier:
+            self._account(now)
+            print("[POWER] %s -> %s after %d s without input" % (self.tier, tier, now - self.last_activity))
+            self.tier = tier
+            self._set_blank(tier == TIER_BLANK)
+        return tier
+
+    def _account(self, now):
+        cpu = cpu_seconds()
+        usage = self.usage[self.tier]
+        usage[0] += now - self._mark[0]
+        usage[1] += cpu - self._mark[1]
+        self._mark = (now, cpu)
+
+    def _set_blank(self, blank):
+        if blank == self._blanked:
+            return
+        try:
+            with open(self.blank_path, 'w') as f:
+                f.write(FB_BLANK_ON if blank else FB_BLANK_OFF)
+            self._blanked = blank
+        except (IOError, OSError) as e:
+            print("[WARNING] Cannot %s the screen via %s: %s" % ("blank" if blank else "unblank", self.blank_path, e))
+
+    def stats(self):
+        self._account(time.time())
+        out = {}
+        for tier in TIERS:
+            wall, cpu = self.usage[tier]
+            if wall > 0:
+                out[tier] = {"s": int(wall), "cpu_pct": round(100.0 * cpu / wall, 1)}
+        return out
+
+    def close(self):
+        """Unblanks the screen (end of session)."""
+        self._set_blank(False)
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+
+import pygame
+
+# Default memory budget for decoded surfaces waiting in the cache
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def load_fitted_image(file_path, sw, sh):
+    """Decodes a photo and letterbox-scales it to fit a sw x sh screen.
+
+    The surface is converted to the display format when a display is open
+    (a resident slideshow may preload while hidden).
+    """
+    img = pygame.image.load(file_path)
+    if pygame.display.get_surface() is not None:
+        img = img.convert()
+    img_w, img_h = img.get_size()
+    ratio = min(float(sw) / img_w, float(sh) / img_h)
+    return pygame.transform.scale(img, (int(img_w * ratio), int(img_h * ratio)))
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class ImagePrefetcher(object):
+    """Decodes upcoming photos on a worker thread into a bounded cache."""
+
+    def __init__(self, screen_size, max_bytes=DEFAULT_MAX_BYTES, loader=load_fitted_image):
+        self.screen_size = screen_size
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._wanted = []
+        self._failed = set()
+        self._loading = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._worker)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._wanted = []
+            self._drop_unwanted()
+            self._cond.notify_all()
+
+    def want(self, paths):
+        """Sets the photos to keep ready, most urgent first."""
+        with self._cond:
+            self._wanted = list(paths)
+            self._failed.intersection_update(self._wanted)
+            self._drop_unwanted()
+            self._cond.notify_all()
+
+    def get(self, path, wait=True):
+        """Returns the cached surface for path, or None if it isn't ready.
+
+        When the worker is decoding that very file, waits for it rather than
+        decoding it a second time on the caller's thread.
+        """
+        with self._cond:
+            while wait and self._running and self._loading == path:
+                self._cond.wait(0.05)
+            surface = self._cache.get(path)
+            if surface is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return surface
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def _drop_unwanted(self):
+        for path in list(self._cache):
+            if path not in self._wanted:
+                self._cache_bytes -= surface_bytes(self._cache.pop(path))
+
+    def _next_job(self):
+        # Per-surface size is the same order of magnitude for every photo, so
+        # the screen size is a good enough estimate before decoding.
+        estimate = self.screen_size[0] * self.screen_size[1] * 4
+        for path in self._wanted:
+            if path in self._cache or path in self._failed:
+                continue
+            if self._cache and self._cache_bytes + estimate > self.max_bytes:
+                return None
+            return path
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                path = self._next_job()
+                while self._running and path is None:
+                    self._cond.wait()
+                    path = self._next_job()
+                if not self._running:
+                    return
+                self._loading = path
+            surface = None
+            try:
+                surface = self.loader(path, self.screen_size[0], self.screen_size[1])
+            except Exception:
+                pass
+            with self._cond:
+                self._loading = None
+                if surface is None:
+                    self._failed.add(path)
+                elif path in self._wanted and path not in self._cache:
+                    self._cache[path] = surface
+                    self._cache_bytes += surface_bytes(surface)
+                self._cond.notify_all()
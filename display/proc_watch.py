@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+PROC_ROOT = "/proc"
+
+# The kernel truncates /proc/<pid>/comm to 15 characters
+COMM_LEN = 15
+
+
+def read_comm(pid, proc_root=PROC_ROOT):
+    """Returns the process name of pid, or None if it has exited."""
+    try:
+        with open(os.path.join(proc_root, str(pid), "comm"), 'rb') as f:
+            return f.read().decode('utf-8', 'ignore').strip()
+    except (IOError, OSError):
+        return None
+
+
+class ProcessWatcher(object):
+    """Tells whether a process with one of the given names is running, using /proc.
+
+    Matching PIDs are remembered: while one of them is still alive, only that
+    PID is checked instead of scanning the whole process table.
+    """
+
+    def __init__(self, names, proc_root=PROC_ROOT):
+        self.names = set(name[:COMM_LEN] for name in names)
+        self.proc_root = proc_root
+        self.pids = {}  # pid -> name
+
+    def scan(self):
+        self.pids = {}
+        try:
+            entries = os.listdir(self.proc_root)
+        except OSError:
+            return self.pids
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            comm = read_comm(entry, self.proc_root)
+            if comm in self.names:
+                self.pids[int(entry)] = comm
+        return self.pids
+
+    def is_running(self):
+        for pid, name in list(self.pids.items()):
+            # Same name check guards against the PID being reused
+            if read_comm(pid, self.proc_root) == name:
+                return True
+            del self.pids[pid]
+        return bool(self.scan())
+
+
+def ps_is_running(names):
+    """The former check: substring match on the output of `ps w`."""
+    try:
+        output = subprocess.check_output("ps w", shell=True)
+        if hasattr(output, 'decode'):
+            output = output.decode('utf-8', 'ignore')
+        return any(name in output for name in names)
+    except Exception:
+        return False
+
+
+def bench(label, func, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        func()
+    ms = (time.time() - start) * 1000.0 / rounds
+    print("%-28s %8.3f ms/check" % (label, ms))
+    return ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the running-game check.")
+    parser.add_argument("names", nargs="*", default=["retroarch", "mupen64plus", "fba2x", "ppsspp", "dolphin-emu"])
+    parser.add_argument("-n", "--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    watcher = ProcessWatcher(args.names)
+    running = watcher.is_running()
+    print("Matching processes: %s" % (watcher.pids or "none"))
+    legacy = bench("ps w + substring", lambda: ps_is_running(args.names), args.rounds)
+    scan = bench("/proc scan", watcher.scan, args.rounds)
+    if running:
+        cached = bench("/proc cached pids", watcher.is_running, args.rounds)
+        print("cached pids: %.0fx faster than ps" % (legacy / cached if cached else 0))
+    print("/proc scan: %.0fx faster than ps" % (legacy / scan if scan else 0))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+from collections import deque
+
+# Set to "1" (or to the path of the stats file) to profile without --profile
+PROFILE_ENV = "SLIDESHOW_PROFILE"
+DEFAULT_STATS_FILE = "/tmp/slideshow_stats.json"
+
+# Path of the action trace written for input replays (see input_replay.py)
+TRACE_ENV = "SLIDESHOW_TRACE"
+
+# Phases of the main loop, in the order they are marked
+PHASES = ("input", "events", "load", "render", "overlays", "flip", "sleep")
+
+# Seconds between two writes of the stats file
+WRITE_INTERVAL = 10.0
+
+# Timings kept per phase for the percentiles
+WINDOW = 500
+
+
+def read_memory_kb():
+    """Returns (current RSS, peak RSS) of this process in kB, from /proc."""
+    rss = peak = 0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return rss, peak
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(round((len(sorted_values) - 1) * q))]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 0.5), 2),
+        "p90": round(percentile(values, 0.9), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "max": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def profile_requested(flag=False):
+    """Returns the stats file to write if profiling is enabled by flag or env, else None."""
+    value = os.environ.get(PROFILE_ENV, "")
+    if value and value != "0":
+        return DEFAULT_STATS_FILE if value == "1" else value
+    return DEFAULT_STATS_FILE if flag else None
+
+
+class LoopProfiler(object):
+    """Opt-in timing of each phase of the slideshow main loop.
+
+    Counters (decode failures, skipped files...) are always kept since they
+    are cheap; phase timings and the stats file only when enabled.
+    """
+
+    def __init__(self, stats_path=None, timing=False, window=WINDOW):
+        self.enabled = timing or stats_path is not None
+        self.stats_path = stats_path
+        self.window = window
+        self.samples = dict((phase, deque(maxlen=window)) for phase in PHASES)
+        self.events = {}  # one-off operations (slide loads, mode switches...)
+        self.counters = {}
+        self.started = time.time()
+        self._mark = self.started
+        self._next_write = self.started + WRITE_INTERVAL
+
+    def start_frame(self):
+        self._mark = time.time()
+
+    def mark(self, phase):
+        """Records the time spent since the previous mark under phase."""
+        if not self.enabled:
+            return
+        now = time.time()
+        self.samples[phase].append((now - self._mark) * 1000.0)
+        self._mark = now
+
+    def record(self, name, ms):
+        """Records the duration of a one-off operation such as a slide load."""
+        if not self.enabled:
+            return
+        if name not in self.events:
+            self.events[name] = deque(maxlen=self.window)
+        self.events[name].append(ms)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def phase_stats(self):
+        return dict((phase, summarize(self.samples[phase])) for phase in PHASES)
+
+    def event_stats(self):
+        return dict((name, summarize(values)) for name, values in self.events.items())
+
+    def snapshot(self, extra=None):
+        rss, peak = read_memory_kb()
+        data = {
+            "time": int(time.time()),
+            "uptime_s": int(time.time() - self.started),
+            "phases_ms": self.phase_stats(),
+            "events_ms": self.event_stats(),
+            "counters": self.counters,
+            "rss_kb": rss,
+            "peak_rss_kb": peak,
+        }
+        if extra:
+            data.update(extra)
+        return data
+
+    def write(self, extra=None):
+        tmp_path = self.stats_path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(extra), f, sort_keys=True, separators=(',', ':'))
+            os.rename(tmp_path, self.stats_path)
+        except (IOError, OSError):
+            pass
+
+    def maybe_write(self, extra_fn):
+        """Writes the stats file every WRITE_INTERVAL seconds; extra_fn() adds loop-level stats."""
+        if self.stats_path and time.time() >= self._next_write:
+            self._next_write = time.time() + WRITE_INTERVAL
+            self.write(extra_fn())
+
+    def hud_lines(self, extra=None):
+        """Short text lines for the on-screen debug HUD."""
+        lines = []
+        stats = self.phase_stats()
+        for phase in PHASES:
+            st = stats[phase]
+            lines.append(u"%-8s p50 %5.1f  p90 %5.1f  max %6.1f ms" % (phase, st["p50"], st["p90"], st["max"]))
+        rss, _ = read_memory_kb()
+        lines.append(u"rss %d kB  %s" % (rss, u"  ".join(u"%s %s" % kv for kv in sorted(self.counters.items()))))
+        if extra:
+            lines.append(u"  ".join(u"%s %s" % kv for kv in sorted(extra.items())))
+        return lines
+
+
+class ActionTrace(object):
+    """Appends timestamped user-visible actions to the file named by SLIDESHOW_TRACE.
+
+    Both the slideshow and the idle monitor write to the same file (O_APPEND,
+    one write per line), so input_replay.py can match each replayed button
+    press with what it caused. Does nothing when the variable is unset.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.environ.get(TRACE_ENV)
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644) if path else None
+        self.pending = False
+
+    def log(self, action, detail=""):
+        if self.fd is not None:
+            line = ("%.6f %s %s" % (time.time(), action, detail)).rstrip()
+            os.write(self.fd, (line + "\n").encode('utf-8'))
+            self.pending = True
+
+    def frame(self):
+        """Logs the first frame flipped after an action."""
+        if self.pending:
+            self.log("frame")
+            self.pending = False
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import json
+import threading
+
+from media_index import write_json_atomic
+
+# Seconds changes are held in memory before being written out together
+DEBOUNCE = 2.0
+
+SETTINGS_VERSION = 1
+
+
+def number(lo, hi):
+    def check(value):
+        if isinstance(value, bool):
+            raise ValueError("not a number")
+        return min(hi, max(lo, float(value)))
+    return check
+
+
+def integer(lo=None, hi=None):
+    def check(value):
+        if isinstance(value, bool) or (isinstance(value, float) and value != int(value)):
+            raise ValueError("not an integer")
+        value = int(value)
+        if lo is not None: value = max(lo, value)
+        if hi is not None: value = min(hi, value)
+        return value
+    return check
+
+
+def boolean(value):
+    if isinstance(value, bool):
+        return value
+    if value in (0, 1, "0", "1", "true", "false", "True", "False"):
+        return value in (1, "1", "true", "True")
+    raise ValueError("not a boolean")
+
+
+def optional(check):
+    def check_optional(value):
+        return None if value is None else check(value)
+    return check_optional
+
+
+def mapping(value):
+    if not isinstance(value, dict):
+        raise ValueError("not an object")
+    return value
+
+
+def choice(values):
+    def check(value):
+        if value not in values:
+            raise ValueError("not one of %s" % ", ".join(str(v) for v in values))
+        return value
+    return check
+
+
+class SettingsStore(object):
+    """Settings kept in memory, written to disk atomically and at most every DEBOUNCE seconds.
+
+    set() applies a change at once and arms a timer; the write happens on the
+    timer thread (temp file, fsync, rename), so holding the stick on the speed
+    setting costs one SD card write, not one per step. Loading validates each
+    key on its own: a bad value falls back to its default instead of
+    discarding the whole file.
+    """
+
+    def __init__(self, path, defaults, schema, debounce=DEBOUNCE):
+        self.path = path
+        self.defaults = dict(defaults)
+        self.schema = schema  # key -> check(value) returning the cleaned value or raising ValueError
+        self.debounce = debounce
+        self.values = dict(defaults, version=SETTINGS_VERSION)
+        self.writes = 0
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("not an object")
+        except (IOError, OSError):
+            return self
+        except ValueError as e:
+            # Kept aside rather than silently overwritten with the defaults
+            print("[WARNING] Unreadable settings %s (%s), using defaults" % (self.path, e))
+            try:
+                os.rename(self.path, self.path + ".corrupt")
+            except OSError:
+                pass
+            return self
+        migrated = self.migrate(data)
+        for key, value in data.items():
+            check = self.schema.get(key)
+            if check is None:
+                self.values[key] = value  # unknown to this version: kept as is
+                continue
+            try:
+                self.values[key] = check(value)
+            except (TypeError, ValueError) as e:
+                print("[WARNING] Setting %s=%r ignored: %s" % (key, value, e))
+        if migrated:
+            with self._lock:
+                self._schedule()
+        return self
+
+    def migrate(self, data):
+        """Upgrades data saved by an older version in place; returns True if it changed."""
+        version = data.get("version", 0)
+        if isinstance(version, int) and version >= SETTINGS_VERSION:
+            return False
+        # v0 (unversioned): values could be saved as strings by hand edits, the checks coerce them
+        data["version"] = SETTINGS_VERSION
+        return True
+
+    def get(self, key, default=None):
+        return self.values.get(key, self.defaults.get(key, default))
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            if self.values.get(key) == value and key in self.values:
+                return
+            self.values[key] = value
+            self._schedule()
+
+    def _schedule(self):
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Writes pending changes now (called by the timer, and on exit)."""
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return
+            data = dict(self.values)
+            self._dirty = False
+        try:
+            write_json_atomic(self.path, data)
+            self.writes += 1
+        except (IOError, OSError) as e:
+            print("[WARNING] Cannot save settings: %s" % e)
+            with self._lock:
+                self._dirty = True
+
+    def close(self):
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer:
+            timer.cancel()
+        self.flush()
@@ -1,20 +1,34 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import time
+# Mesure du temps de démarrage (avant le coûteux import pygame)
+PROCESS_START = time.time()
+
 import pygame
 import os
-import time
 import sys
 import argparse
-import glob
-import fcntl
-import struct
-import random
 import json
-import subprocess
-import signal
 import re
 
+from prefetch import ImagePrefetcher, load_fitted_image
+from zoom import ZoomRenderer, ZOOM_ENGINES, DEFAULT_ZOOM_ENGINE, DEFAULT_ZOOM_STEP
+from transitions import TransitionRenderer, TRANSITIONS, DEFAULT_TRANSITION, BLEND_ENGINES, DEFAULT_BLEND_ENGINE
+from frame_clock import FrameScheduler, DEFAULT_FPS, IDLE_FRAME_TIME, MAX_FRAME_DT
+from input_reader import InputReader
+from media_index import MediaIndex, PHOTO_EXTENSIONS
+from control import ControlServer, CONTROL_SOCKET
+from text_cache import TextCache
+from profiler import LoopProfiler, ActionTrace, profile_requested, DEFAULT_STATS_FILE
+from manifest import MetadataManifest
+from gamelist import GamelistIndex
+from pixel_cache import PixelCache
+from video_player import VideoPlayer
+from playlist import Playlist
+from settings_store import SettingsStore, number, integer, boolean, choice, optional, mapping
+from power import PowerManager, TIER_ACTIVE, TIER_BLANK, time_window
+
 # --- CONFIGURATION PAR DÉFAUT ---
 INFO_BUTTON_DEFAULT = 289
 MODE_BUTTON_DEFAULT = 304 
@@ -22,13 +36,32 @@ IMAGE_FOLDER = "/recalbox/share/userscripts/slideshow/images"
 VIDEO_PERSO_FOLDER = "/recalbox/share/userscripts/slideshow/videos"
 ROMS_FOLDER = "/recalbox/share/roms"
 SETTINGS_FILE = "/recalbox/share/userscripts/slideshow/slideshow_settings.json"
+MEDIA_INDEX_FILE = "/recalbox/share/userscripts/slideshow/media_index.json"
+GAMELIST_CACHE_FILE = "/recalbox/share/userscripts/slideshow/gamelist_index.json"
+PIXEL_CACHE_FOLDER = "/recalbox/share/userscripts/slideshow/cache"
 
 DEFAULT_DISPLAY_TIME = 15 
 MIN_DISPLAY_TIME = 1
 MAX_DISPLAY_TIME = 120
+# Vitesses exprimées par image à REFERENCE_FPS, appliquées au temps écoulé réel
+REFERENCE_FPS = 25
 ZOOM_SPEED = 0.00015
 FADE_SPEED = 8
 
+# Préchargement des photos suivantes (nombre d'images, mémoire max)
+PREFETCH_DEPTH = 3
+PREFETCH_MAX_MB = 32
+
+# Photos déjà mises à l'échelle et au format de l'écran, sur disque (0 = désactivé)
+PIXEL_CACHE_MAX_MB = 512
+
+# Veille longue sans bouton : image fixe à basse cadence, puis écran éteint (minutes, 0 = jamais)
+DIM_AFTER_MIN = 60
+BLANK_AFTER_MIN = 180
+LOW_POWER_FPS = 5
+# Écran éteint : la boucle ne se réveille que sur un bouton, ou toutes les 2 s
+BLANK_FRAME_TIME = 2.0
+
 # Modes
 MODE_PHOTOS = 1
 MODE_VIDEOS_PERSO = 2
@@ -44,19 +77,48 @@ ABS_Y = 1
 ABS_HAT0X = 16
 ABS_HAT0Y = 17
 
+SETTINGS_DEFAULTS = {"display_time": DEFAULT_DISPLAY_TIME, "info_button": INFO_BUTTON_DEFAULT, "mode_button": MODE_BUTTON_DEFAULT, "current_mode": MODE_PHOTOS, "is_muted": False}
+# Chaque réglage est vérifié séparément : une valeur invalide ne fait perdre que celle-ci
+SETTINGS_SCHEMA = {
+    "version": integer(0),
+    "display_time": number(MIN_DISPLAY_TIME, MAX_DISPLAY_TIME),
+    "info_button": integer(0),
+    "mode_button": integer(0),
+    "hud_button": optional(integer(0)),
+    "current_mode": choice((MODE_PHOTOS, MODE_VIDEOS_PERSO, MODE_VIDEOS_GAMES, MODE_CYCLE)),
+    "is_muted": boolean,
+    "zoom_engine": choice(ZOOM_ENGINES),
+    "zoom_step": integer(1),
+    "transition": choice(TRANSITIONS),
+    "transition_blend": choice(BLEND_ENGINES),
+    "target_fps": integer(1, 60),
+    "pixel_cache_mb": integer(0),
+    "dim_after_min": number(0, 24 * 60),
+    "blank_after_min": number(0, 24 * 60),
+    "night_window": optional(time_window),
+    "fb_blank_path": optional(str),
+    "playlists": mapping,
+}
+
 def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        try:
-            with open(SETTINGS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception: pass
-    return {"display_time": DEFAULT_DISPLAY_TIME, "info_button": INFO_BUTTON_DEFAULT, "mode_button": MODE_BUTTON_DEFAULT, "current_mode": MODE_PHOTOS, "is_muted": False}
+    return SettingsStore(SETTINGS_FILE, SETTINGS_DEFAULTS, SETTINGS_SCHEMA).load()
 
-def save_settings(settings):
-    try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f)
-    except Exception: pass
+def is_game_video_dir(path):
+    return any(x in path.lower() for x in ["media/videos", "downloaded_images", "videos"])
+
+def build_media_index():
+    index = MediaIndex(MEDIA_INDEX_FILE)
+    index.add_collection(MODE_PHOTOS, IMAGE_FOLDER, PHOTO_EXTENSIONS)
+    index.add_collection(MODE_VIDEOS_PERSO, VIDEO_PERSO_FOLDER, ('.mp4', '.mkv', '.avi', '.mov'))
+    index.add_collection(MODE_VIDEOS_GAMES, ROMS_FOLDER, ('.mp4', '.mkv', '.avi'), recursive=True, dir_filter=is_game_video_dir)
+    return index
+
+def print_index_stats(index):
+    names = {MODE_PHOTOS: "Photos", MODE_VIDEOS_PERSO: "Videos", MODE_VIDEOS_GAMES: "Games"}
+    for mode, st in sorted(index.stats().items()):
+        print("%-8s %6d files  %5d folders  %s" % (names[mode], st["files"], st["dirs"], st["folder"]))
+    if index.refreshed_at:
+        print("Updated: %s" % time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(index.refreshed_at)))
 
 def get_sidecar_data(file_path):
     txt_path = os.path.splitext(file_path)[0] + ".txt"
@@ -73,6 +135,11 @@ def get_sidecar_data(file_path):
         except Exception: pass
     return data
 
+def get_media_data(file_path, manifest):
+    # Manifest du sélecteur d'abord (déjà en mémoire), sinon le .txt à côté du fichier
+    data = manifest.get(file_path)
+    return data if data is not None else get_sidecar_data(file_path)
+
 def clean_game_name(name):
     cleaned = re.sub(r'[\(\[].*?[\)\]]', '', name)
     cleaned = cleaned.replace('_', ' ').strip()
@@ -81,7 +148,7 @@ def clean_game_name(name):
         cleaned = "The " + cleaned[:-5].strip()
     return cleaned.title()
 
-def parse_game_metadata(file_path):
+def parse_game_metadata(file_path, gamelists=None):
     parts = file_path.split('/')
     console = u"Inconnu"
     try:
@@ -89,42 +156,44 @@ def parse_game_metadata(file_path):
             idx = parts.index("roms")
             if len(parts) > idx + 1: console = parts[idx+1].upper()
     except Exception: pass
+    # Nom, année et genre scrapés dans gamelist.xml, sinon déduits du nom du fichier
+    game = gamelists.get(file_path) if gamelists else None
+    if game:
+        return {"console": console, "game": game["name"], "year": game["year"], "genre": game["genre"]}
     bname = os.path.splitext(os.path.basename(file_path))[0]
     if hasattr(bname, 'decode'): bname = bname.decode('utf-8', 'ignore')
     game_name = clean_game_name(bname)
     return {"console": console, "game": game_name}
 
-def get_input_devices():
-    return glob.glob('/dev/input/event*')
-
-def stop_video(proc):
-    if proc:
-        try:
-            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-            proc.wait()
-        except: pass
-
-def draw_wrapped_text(screen, text, font, color, rect):
-    parts = re.split(r'([/\\ _-])', text)
+def neighbour_paths(all_files, indices, ptr, depth):
+    # Image courante, les `depth` suivantes, puis la précédente (navigation gauche)
+    paths = []
+    for i in [ptr] + [ptr + k for k in range(1, depth + 1)] + [ptr - 1]:
+        path = all_files[indices[i]]
+        if path not in paths: paths.append(path)
+    return paths
+
+def open_joysticks():
+    """(Ré)ouvre toutes les manettes branchées, y compris celles connectées depuis la dernière fois."""
+    pygame.joystick.quit()
+    pygame.joystick.init()
+    joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
+    for joystick in joysticks: joystick.init()
+    return joysticks
+
+def report_first_frame(started_at, how):
+    ms = (time.time() - started_at) * 1000.0
+    print("[PERF] First frame after %d ms (%s)" % (ms, how))
+    return ms
+
+def draw_wrapped_text(screen, text, font, color, rect, text_cache):
     y = rect.top
-    line = ""
-    for part in parts:
-        test_line = line + part
-        if font.size(test_line)[0] < rect.width:
-            line = test_line
-        else:
-            if line:
-                txt_surface = font.render(line, True, color)
-                screen.blit(txt_surface, (rect.left, y))
-                y += font.get_linesize()
-            line = part
-            if y > rect.bottom - font.get_linesize(): break
-    if line and y <= rect.bottom - font.get_linesize():
-        txt_surface = font.render(line, True, color)
-        screen.blit(txt_surface, (rect.left, y))
-
-def run_slideshow(enable_animation=True):
-    os.environ["SDL_VIDEODRIVER"] = "fbcon"
+    for line in text_cache.wrap(font, text, rect.width, rect.height):
+        screen.blit(text_cache.render(font, line, color), (rect.left, y))
+        y += font.get_linesize()
+
+def run_slideshow(enable_animation=True, zoom_engine=None, transition=None, target_fps=None, daemon=False, profile=False, show_hud=False):
+    os.environ.setdefault("SDL_VIDEODRIVER", "fbcon")
     os.environ["SDL_NOMOUSE"] = "1"
     
     settings = load_settings()
@@ -133,292 +202,479 @@ def run_slideshow(enable_animation=True):
     mode_button_code = settings.get("mode_button", MODE_BUTTON_DEFAULT)
     current_mode = settings.get("current_mode", MODE_PHOTOS)
     is_muted = settings.get("is_muted", False)
-    
-    internal_mode = current_mode if current_mode != MODE_CYCLE else MODE_PHOTOS
-    last_cycle_time = time.time()
+    if zoom_engine is None: zoom_engine = settings.get("zoom_engine", DEFAULT_ZOOM_ENGINE)
+    zoom_renderer = ZoomRenderer(zoom_engine, settings.get("zoom_step", DEFAULT_ZOOM_STEP))
+    # Sans animation, la photo suivante remplace la précédente d'un coup
+    if not enable_animation: transition = "cut"
+    elif transition is None: transition = settings.get("transition", DEFAULT_TRANSITION)
+    transition_renderer = TransitionRenderer(transition, settings.get("transition_blend", DEFAULT_BLEND_ENGINE))
+    if target_fps is None: target_fps = settings.get("target_fps", DEFAULT_FPS)
+    hud_button_code = settings.get("hud_button")
+    profiler = LoopProfiler(profile_requested(profile), timing=show_hud)
 
     pygame.init()
-    if pygame.joystick.get_count() > 0:
-        pygame.joystick.init()
-        for i in range(pygame.joystick.get_count()):
-            pygame.joystick.Joystick(i).init()
+    joysticks = open_joysticks()
     
-    devices = get_input_devices()
-    input_files = []
-    for dev in devices:
-        try:
-            f = open(dev, 'rb')
-            fd = f.fileno()
-            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
-            input_files.append(f)
-        except: pass
-
-    event_format = 'llHHi' 
-    event_size = struct.calcsize(event_format)
+    input_reader = InputReader()
+    # Mesure de latence (input_replay.py) : actions horodatées
+    trace = ActionTrace()
+
     info = pygame.display.Info()
     sw, sh = info.current_w, info.current_h
     if sw == 0 or sh == 0: sw, sh = 1280, 1024 
-    
-    screen = pygame.display.set_mode((sw, sh), pygame.FULLSCREEN)
-    pygame.mouse.set_visible(False)
+    # En mode résident, l'écran n'est ouvert que pendant l'affichage (libéré pour EmulationStation)
+    if daemon: pygame.display.quit()
     
     font_main = pygame.font.Font(None, int(sh * 0.05))
     font_small = pygame.font.Font(None, int(sh * 0.03))
     font_tiny = pygame.font.Font(None, int(sh * 0.022))
+    text_cache = TextCache()
+    hud_lines = []; hud_refresh = 0
 
-    def get_files_for_mode(mode):
-        if mode == MODE_PHOTOS:
-            return sorted([os.path.join(IMAGE_FOLDER, f) for f in os.listdir(IMAGE_FOLDER) if f.lower().endswith('.jpg')])
-        elif mode == MODE_VIDEOS_PERSO:
-            if not os.path.exists(VIDEO_PERSO_FOLDER): return []
-            return sorted([os.path.join(VIDEO_PERSO_FOLDER, f) for f in os.listdir(VIDEO_PERSO_FOLDER) if f.lower().endswith(('.mp4', '.mkv', '.avi', '.mov'))])
-        elif mode == MODE_VIDEOS_GAMES:
-            vids = []
-            if os.path.exists(ROMS_FOLDER):
-                for root, dirs, files in os.walk(ROMS_FOLDER):
-                    if any(x in root.lower() for x in ["media/videos", "downloaded_images", "videos"]):
-                        for f in files:
-                            if f.lower().endswith(('.mp4', '.mkv', '.avi')): vids.append(os.path.join(root, f))
-            return sorted(vids)
-        return []
-
-    all_files = get_files_for_mode(internal_mode)
-    indices = list(range(len(all_files)))
-    random.shuffle(indices)
-    current_idx_ptr = 0
-
-    running = True; need_load = True; last_switch = time.time()
-    current_img_raw = None; zoom_factor = 1.0; alpha = 0; meta_data = {}
-    
-    show_info = False; info_timer = 0; INFO_DURATION = 15
-    last_detected_code = 0; code_timer = 0
-    speed_overlay_timer = 0; mode_overlay_timer = 0; mute_overlay_timer = 0
-    OVERLAY_DURATION = 3
+    pixel_cache_mb = settings.get("pixel_cache_mb", PIXEL_CACHE_MAX_MB)
+    pixel_cache = PixelCache(PIXEL_CACHE_FOLDER, (sw, sh), info.bitsize, info.masks, pixel_cache_mb * 1024 * 1024) if pixel_cache_mb else None
+    load_photo = pixel_cache.load if pixel_cache else load_fitted_image
+    prefetcher = ImagePrefetcher((sw, sh), PREFETCH_MAX_MB * 1024 * 1024, load_photo)
+    prefetcher.start()
+
+    # Index des médias : chargé depuis le disque, puis mis à jour en tâche de fond à chaque session
+    media_index = build_media_index()
+    if not media_index.load(): media_index.refresh()
 
-    last_nav_time = 0; last_speed_time = 0; video_proc = None
+    manifest = MetadataManifest([IMAGE_FOLDER, VIDEO_PERSO_FOLDER])
+    # Métadonnées des jeux : cache et gamelist.xml modifiés lus en tâche de fond (nom du fichier en attendant)
+    gamelists = GamelistIndex(ROMS_FOLDER, GAMELIST_CACHE_FILE)
+
+    def get_files_for_mode(mode):
+        start = time.time()
+        files = media_index.files(mode) if mode in media_index.collections else []
+        profiler.record("mode_switch", (time.time() - start) * 1000.0)
+        return files
+
+    # Un curseur par mode, conservé entre les rotations du cycle et d'une session à l'autre
+    playlists = {}
+
+    def open_playlist(mode):
+        files = get_files_for_mode(mode)
+        playlist = playlists.get(mode)
+        if playlist is None or len(playlist) != len(files):
+            playlist = Playlist.restore(settings.get("playlists", {}).get(str(mode)), len(files))
+            playlists[mode] = playlist
+        return files, playlist, playlist.position
+
+    def save_playlist(mode, position):
+        playlists[mode].position = position
+        settings.set("playlists", dict((str(m), p.state()) for m, p in playlists.items()))
+
+    def loop_stats():
+        stats = frame_clock.stats()
+        stats.update(animation=enable_animation, zoom_engine=zoom_renderer.engine, zoom_scales=zoom_renderer.scales,
+                     transition=transition_renderer.kind, transition_blend=transition_renderer.blend,
+                     mode=internal_mode, prefetch_hit_rate=round(prefetcher.hit_rate(), 3))
+        if pixel_cache: stats["pixel_cache"] = pixel_cache.stats()
+        stats["video_launches"] = video_player.launches
+        stats["power"] = dict(power.stats(), tier=power.tier)
+        return stats
+
+    def prepare_clip(file_path, mode, muted):
+        # Étiquettes et commande du lecteur, préparées pendant la lecture du clip précédent
+        labels = []
+        if mode == MODE_VIDEOS_GAMES:
+            vm = parse_game_metadata(file_path, gamelists)
+            game = u"%s (%s)" % (vm["game"], vm["year"]) if vm.get("year") else vm["game"]
+            console = u"%s - %s" % (vm["console"], vm["genre"]) if vm.get("genre") else vm["console"]
+            t1 = text_cache.render_shadowed(font_small, game, (255, 255, 255))
+            t2 = text_cache.render_shadowed(font_small, console, (0, 255, 255)) # Uniformisé
+            # Les surfaces ombrées font 2 px de plus que le texte
+            labels += [(t1, (sw - t1.get_width() - 18, sh - 45)), (t2, (20, sh - 45))]
+        else:
+            vm = get_media_data(file_path, manifest)
+            label = vm.get("label", u"Vidéo Perso")
+            t1 = text_cache.render_shadowed(font_small, label, (255, 255, 255))
+            labels.append((t1, (sw - t1.get_width() - 18, sh - 45)))
+            if vm.get("info"):
+                t2 = text_cache.render_shadowed(font_tiny, u"Durée : %s" % vm["info"], (200, 200, 200))
+                labels.append((t2, (20, sh - 45)))
+        margin_h = 60
+        cmd = ["omxplayer", "-o", "both", "--no-osd", "--aspect-mode", "letterbox", "--win", "0,0,%d,%d" % (sw, sh - margin_h)]
+        if muted: cmd += ["--vol", "-6000"]
+        cmd.append(file_path)
+        return {"path": file_path, "mode": mode, "muted": muted, "labels": labels, "cmd": cmd}
+
+    def video_error(e):
+        print("[WARNING] Cannot start omxplayer: %s" % e)
+        profiler.count("video_errors")
+
+    video_player = VideoPlayer(on_error=video_error)
+    control = ControlServer(CONTROL_SOCKET) if daemon else None
+    launched_at = float(os.environ.get("SLIDESHOW_LAUNCHED_AT", PROCESS_START))
+    next_clip = None; prepared = False; power = None
 
     try:
-        while running:
-            now = time.time()
-            
-            # --- 1. LOGIQUE TIMERS & CYCLE ---
-            if current_mode == MODE_CYCLE and now - last_cycle_time > CYCLE_INTERVAL:
-                internal_mode = (internal_mode % 3) + 1
-                all_files = get_files_for_mode(internal_mode)
-                indices = list(range(len(all_files)))
-                random.shuffle(indices)
-                current_idx_ptr = 0; need_load = True; last_cycle_time = now
-                if video_proc: stop_video(video_proc); video_proc = None
-
-            if show_info and now > info_timer:
-                show_info = False
-
-            # --- 2. ENTRÉES ---
-            for f in input_files:
-                try:
-                    data = f.read(event_size)
-                    while data:
-                        _, _, ev_type, ev_code, ev_value = struct.unpack(event_format, data)
-                        if ev_type == EV_KEY and ev_value == 1: 
-                            if ev_code not in (info_button_code, mode_button_code):
-                                last_detected_code = ev_code
-                                code_timer = now + 4
-                            
-                            if show_info:
-                                if ev_code == info_button_code: show_info = False
-                                else: info_timer = now + INFO_DURATION
-                            else:
-                                if ev_code == info_button_code:
-                                    if internal_mode == MODE_PHOTOS:
-                                        show_info = True; info_timer = now + INFO_DURATION
-                                    else:
-                                        is_muted = not is_muted
-                                        mute_overlay_timer = now + OVERLAY_DURATION
-                                        settings["is_muted"] = is_muted; save_settings(settings)
-                                        if video_proc: stop_video(video_proc); video_proc = None; need_load = True
-                                elif ev_code == mode_button_code:
-                                    # Feedback immédiat : on lance la transition
-                                    current_mode = (current_mode % 4) + 1
-                                    internal_mode = current_mode if current_mode != MODE_CYCLE else MODE_PHOTOS
-                                    all_files = get_files_for_mode(internal_mode)
-                                    indices = list(range(len(all_files)))
-                                    random.shuffle(indices)
-                                    current_idx_ptr = 0
-                                    
-                                    # Reset visuel immédiat pour éviter superposition
-                                    screen.fill((0, 0, 0))
-                                    current_img_raw = None
-                                    alpha = 0
-                                    
-                                    mode_overlay_timer = now + OVERLAY_DURATION
-                                    settings["current_mode"] = current_mode; save_settings(settings)
-                                    last_cycle_time = now; need_load = True
-                                    if video_proc: stop_video(video_proc); video_proc = None
+        while True:
+            show_requested_at = launched_at
+            if control:
+                # Mode résident : tout est déjà chargé, on attend l'ordre d'affichage du moniteur
+                command = None
+                while command != "show":
+                    command = control.wait_command()
+                    if command == "quit": return
+                    if command == "ping": control.reply("pong")
+                    if command == "prepare":
+                        # Pendant l'arrêt d'EmulationStation : liste de lecture et première image prêtes
+                        internal_mode = current_mode if current_mode != MODE_CYCLE else MODE_PHOTOS
+                        all_files, indices, current_idx_ptr = open_playlist(internal_mode)
+                        if internal_mode == MODE_PHOTOS and indices:
+                            prefetcher.want(neighbour_paths(all_files, indices, current_idx_ptr, PREFETCH_DEPTH))
+                        prepared = True
+                        control.reply("prepared")
+                show_requested_at = time.time()
+                input_reader.drain()
+                pygame.display.init()
+                # Manettes Bluetooth ou branchées depuis le démarrage du démon
+                joysticks = open_joysticks()
+
+            # Le démon tourne aussi longtemps que la borne : les médias ajoutés depuis sont pris en compte ici
+            manifest.refresh()
+            media_index.refresh_in_background()
+            gamelists.refresh_in_background()
+            screen = pygame.display.set_mode((sw, sh), pygame.FULLSCREEN)
+            pygame.mouse.set_visible(False)
+            pygame.event.clear()
+            frame_clock = FrameScheduler(target_fps)
+            power = PowerManager(settings.get("dim_after_min", DIM_AFTER_MIN) * 60, settings.get("blank_after_min", BLANK_AFTER_MIN) * 60,
+                                 settings.get("night_window"), settings.get("fb_blank_path"))
+            power_tier = TIER_ACTIVE
+            last_cycle_time = time.time()
+
+            if not prepared:
+                internal_mode = current_mode if current_mode != MODE_CYCLE else MODE_PHOTOS
+                all_files, indices, current_idx_ptr = open_playlist(internal_mode)
+            prepared = False
+
+            running = True; need_load = True; last_switch = time.time()
+            current_img_raw = None; zoom_factor = 1.0; alpha = 0; meta_data = {}
+    
+            show_info = False; info_timer = 0; INFO_DURATION = 15
+            last_detected_code = 0; code_timer = 0
+            speed_overlay_timer = 0; mode_overlay_timer = 0; mute_overlay_timer = 0
+            OVERLAY_DURATION = 3
+
+            last_nav_time = 0; last_speed_time = 0
+            last_scene = None; pending_events = []; first_frame = True
+            # Temps écoulé depuis la dernière image dessinée : les réveils sur un bouton ne la dessinent pas
+            anim_dt = 0.0
+
+            while running:
+                anim_dt = min(anim_dt + frame_clock.tick(), MAX_FRAME_DT)
+                now = time.time()
+                profiler.start_frame()
+        
+                # --- 1. LOGIQUE TIMERS & CYCLE ---
+                if current_mode == MODE_CYCLE and now - last_cycle_time > CYCLE_INTERVAL:
+                    # Le mode quitté reprendra après le dernier élément affiché
+                    if indices: save_playlist(internal_mode, current_idx_ptr + (0 if need_load else 1))
+                    internal_mode = (internal_mode % 3) + 1
+                    all_files, indices, current_idx_ptr = open_playlist(internal_mode)
+                    need_load = True; last_cycle_time = now
+                    video_player.stop()
+
+                if show_info and now > info_timer:
+                    show_info = False
+
+                # --- 2. ENTRÉES ---
+                if pending_events:
+                    trace.log("input", len(pending_events))
+                    power.activity(now)
+                    # Écran éteint : le bouton ne fait que le rallumer
+                    if power.tier == TIER_BLANK: pending_events = []; trace.log("wake")
+                for ev_type, ev_code, ev_value in pending_events:
+                    if ev_type == EV_KEY and ev_value == 1: 
+                        if hud_button_code and ev_code == hud_button_code:
+                            # Bouton de diagnostic : affiche/masque le HUD de performances
+                            show_hud = not show_hud; profiler.enabled = True
+                            trace.log("hud")
+                            continue
+                        if ev_code not in (info_button_code, mode_button_code):
+                            last_detected_code = ev_code
+                            code_timer = now + 4
+                
+                        if show_info:
+                            if ev_code == info_button_code: show_info = False
+                            else: info_timer = now + INFO_DURATION
+                            trace.log("info")
+                        else:
+                            if ev_code == info_button_code:
+                                if internal_mode == MODE_PHOTOS:
+                                    show_info = True; info_timer = now + INFO_DURATION
+                                    trace.log("info")
                                 else:
-                                    running = False; break
-                        data = f.read(event_size)
-                except: pass
+                                    is_muted = not is_muted
+                                    mute_overlay_timer = now + OVERLAY_DURATION
+                                    settings.set("is_muted", is_muted)
+                                    video_player.stop(); need_load = True
+                                    trace.log("mute")
+                            elif ev_code == mode_button_code:
+                                # Feedback immédiat : on lance la transition
+                                if indices: save_playlist(internal_mode, current_idx_ptr + (0 if need_load else 1))
+                                current_mode = (current_mode % 4) + 1
+                                internal_mode = current_mode if current_mode != MODE_CYCLE else MODE_PHOTOS
+                                all_files, indices, current_idx_ptr = open_playlist(internal_mode)
+                        
+                                # Reset visuel immédiat pour éviter superposition
+                                screen.fill((0, 0, 0))
+                                current_img_raw = None
+                                alpha = 0
+                        
+                                mode_overlay_timer = now + OVERLAY_DURATION
+                                settings.set("current_mode", current_mode)
+                                last_cycle_time = now; need_load = True
+                                video_player.stop()
+                                trace.log("mode", current_mode)
+                            else:
+                                trace.log("exit", ev_code)
+                                running = False; break
+                pending_events = []
+                profiler.mark("input")
+        
+                if not running: break
+        
+                # --- 3. ÉVÉNEMENTS SDL ---
+                sdl_events = pygame.event.get()
+                if power.tier == TIER_BLANK and any(event.type != pygame.QUIT for event in sdl_events):
+                    power.activity(now)
+                    sdl_events = [event for event in sdl_events if event.type == pygame.QUIT]
+                    trace.log("wake")
+                for event in sdl_events:
+                    if event.type in (pygame.QUIT, pygame.KEYDOWN): running = False; trace.log("exit")
             
-            if not running: break
+                    if not show_info:
+                        if internal_mode == MODE_PHOTOS and now - last_speed_time > 0.2:
+                            change = 0
+                            if event.type == pygame.JOYAXISMOTION and event.axis == 1:
+                                if event.value < -0.6: change = 1
+                                elif event.value > 0.6: change = -1
+                            elif event.type == pygame.JOYHATMOTION and event.value[1] != 0:
+                                change = event.value[1]
+                    
+                            if change != 0:
+                                img_per_min = int(round(60.0 / display_time)) + change
+                                img_per_min = max(1, min(60, img_per_min))
+                                display_time = 60.0 / img_per_min
+                                last_speed_time = now; speed_overlay_timer = now + OVERLAY_DURATION
+                                settings.set("display_time", display_time)
+                                trace.log("speed", img_per_min)
+
+                        if now - last_nav_time > 0.4:
+                            steer = 0
+                            if event.type == pygame.JOYAXISMOTION and event.axis == 0:
+                                if abs(event.value) > 0.6: steer = 1 if event.value > 0.6 else -1
+                            elif event.type == pygame.JOYHATMOTION and event.value[0] != 0: steer = event.value[0]
+                            if steer != 0:
+                                current_idx_ptr += steer
+                                need_load = True; last_nav_time = now
+                                video_player.stop()
+                                trace.log("nav", steer)
+
+                # Palier d'économie d'énergie : actif, image fixe à basse cadence, écran éteint
+                if power.update(now) != power_tier:
+                    power_tier = power.tier; last_scene = None
+                    frame_clock.set_fps(target_fps if power_tier == TIER_ACTIVE else LOW_POWER_FPS)
+                    frame_clock.idle_frame_time = BLANK_FRAME_TIME if power_tier == TIER_BLANK else IDLE_FRAME_TIME
+                    if power_tier == TIER_BLANK: video_player.stop()
+                    elif internal_mode != MODE_PHOTOS and not video_player.busy(): need_load = True
+                zooming = enable_animation and power_tier == TIER_ACTIVE
+
+                # --- 4. LOGIQUE CHARGEMENT ---
+                profiler.mark("events")
+                if video_player.update():
+                    current_idx_ptr += 1; need_load = True
+
+                # Dans le cas du chargement suite à un bouton de mode, on attend que l'overlay disparaisse pour charger
+                if need_load and (now < mode_overlay_timer or power_tier == TIER_BLANK):
+                    # On reste sur le nom du mode sans charger l'image/video (ou sur l'écran éteint)
+                    pass
+                elif need_load:
+                    if not indices:
+                        screen.fill((0, 0, 0))
+                        msg = u"Aucun fichier trouvé"
+                        txt = font_main.render(msg, True, (255, 100, 100))
+                        screen.blit(txt, ((sw-txt.get_width())//2, (sh-txt.get_height())//2))
+                        pygame.display.flip(); time.sleep(2); need_load = False; continue
+
+                    file_path = all_files[indices[current_idx_ptr]]
+
+                    if internal_mode == MODE_PHOTOS:
+                        load_start = time.time()
+                        try:
+                            img = prefetcher.get(file_path)
+                            if img is None: img = load_photo(file_path, sw, sh)
+                            elif img.get_bitsize() != screen.get_bitsize(): img = img.convert()
+                            # L'image affichée devient le départ de la transition vers la suivante
+                            transition_renderer.begin(screen)
+                            current_img_raw = img; zoom_renderer.reset(img)
+                            prefetcher.want(neighbour_paths(all_files, indices, current_idx_ptr, PREFETCH_DEPTH))
+                            meta_data = get_media_data(file_path, manifest)
+                            zoom_factor = 1.0; alpha = transition_renderer.start_alpha(); need_load = False; last_switch = now
+                            profiler.record("slide_load", (time.time() - load_start) * 1000.0)
+                        except Exception as e:
+                            print("[WARNING] Cannot load %s: %s" % (file_path, e))
+                            profiler.count("decode_errors")
+                            current_idx_ptr += 1
+                    else:
+                        prefetcher.want([])
+                        clip = next_clip
+                        if not clip or (clip["path"], clip["mode"], clip["muted"]) != (file_path, internal_mode, is_muted):
+                            clip = prepare_clip(file_path, internal_mode, is_muted)
+                        # Lecteur lancé avant de redessiner : l'étiquette est sous la fenêtre vidéo
+                        video_player.play(clip["cmd"])
+                        screen.fill((0, 0, 0))
+                        for surface, pos in clip["labels"]: screen.blit(surface, pos)
+                        pygame.display.flip()
+                        next_clip = prepare_clip(all_files[indices[current_idx_ptr + 1]], internal_mode, is_muted)
+                        need_load = False
+
+                if not need_load and not show_info and internal_mode == MODE_PHOTOS and now - last_switch > display_time and power_tier != TIER_BLANK:
+                    current_idx_ptr += 1; need_load = True
+
+                # --- 5. AFFICHAGE ---
+                profiler.mark("load")
+                # On ne redessine que si l'image bouge (zoom, fondu) ou si un élément affiché a changé
+                # (écran éteint : rien ne bouge, même une transition interrompue par l'extinction)
+                animating = (internal_mode == MODE_PHOTOS and current_img_raw and not need_load and power_tier != TIER_BLANK
+                             and (alpha < 255 or (zooming and not show_info)))
+                scene = (internal_mode, current_mode, current_idx_ptr, need_load, is_muted, display_time, show_info,
+                         int(max(0, info_timer - now)) if show_info else 0, now < code_timer,
+                         now < speed_overlay_timer, now < mode_overlay_timer, now < mute_overlay_timer,
+                         show_hud and hud_refresh)
+                if power_tier == TIER_BLANK or (scene == last_scene and not (animating and frame_clock.due())):
+                    frame_clock.skip()
+                else:
+                    last_scene = scene
+                    frame_clock.begin_render()
+                    dt, anim_dt = anim_dt, 0.0
+                    if internal_mode == MODE_PHOTOS and current_img_raw and not need_load:
+                        if zooming and not show_info: zoom_factor += ZOOM_SPEED * REFERENCE_FPS * dt
+                        if alpha < 255: alpha = min(255, alpha + FADE_SPEED * REFERENCE_FPS * dt)
+                        transition_renderer.draw(screen, zoom_renderer, zoom_factor, int(alpha))
+                        profiler.mark("render")
             
-            # --- 3. ÉVÉNEMENTS SDL ---
-            for event in pygame.event.get():
-                if event.type in (pygame.QUIT, pygame.KEYDOWN): running = False
+                        if show_info:
+                            ov_w, ov_h = sw * 0.7, sh * 0.12
+                            overlay = text_cache.panel((int(ov_w), int(ov_h)), (15, 15, 15), 200)
+                            ox, oy = (sw-ov_w)//2, sh-ov_h-120
+                            screen.blit(overlay, (ox, oy))
                 
-                if not show_info:
-                    if internal_mode == MODE_PHOTOS and now - last_speed_time > 0.2:
-                        change = 0
-                        if event.type == pygame.JOYAXISMOTION and event.axis == 1:
-                            if event.value < -0.6: change = 1
-                            elif event.value > 0.6: change = -1
-                        elif event.type == pygame.JOYHATMOTION and event.value[1] != 0:
-                            change = event.value[1]
-                        
-                        if change != 0:
-                            img_per_min = int(round(60.0 / display_time)) + change
-                            img_per_min = max(1, min(60, img_per_min))
-                            display_time = 60.0 / img_per_min
-                            last_speed_time = now; speed_overlay_timer = now + OVERLAY_DURATION
-                            settings["display_time"] = display_time; save_settings(settings)
-
-                    if now - last_nav_time > 0.4:
-                        steer = 0
-                        if event.type == pygame.JOYAXISMOTION and event.axis == 0:
-                            if abs(event.value) > 0.6: steer = 1 if event.value > 0.6 else -1
-                        elif event.type == pygame.JOYHATMOTION and event.value[0] != 0: steer = event.value[0]
-                        if steer != 0:
-                            current_idx_ptr = (current_idx_ptr + steer) % len(indices)
-                            need_load = True; last_nav_time = now
-                            if video_proc: stop_video(video_proc); video_proc = None
-
-            # --- 4. LOGIQUE CHARGEMENT ---
-            if video_proc and video_proc.poll() is not None:
-                video_proc = None; current_idx_ptr = (current_idx_ptr + 1) % len(indices); need_load = True
-
-            # Dans le cas du chargement suite à un bouton de mode, on attend que l'overlay disparaisse pour charger
-            if need_load and now < mode_overlay_timer:
-                # On reste sur le nom du mode sans charger l'image/video
-                pass
-            elif need_load:
-                if not indices:
-                    screen.fill((0, 0, 0))
-                    msg = u"Aucun fichier trouvé"
-                    txt = font_main.render(msg, True, (255, 100, 100))
-                    screen.blit(txt, ((sw-txt.get_width())//2, (sh-txt.get_height())//2))
-                    pygame.display.flip(); time.sleep(2); need_load = False; continue
-
-                file_path = all_files[indices[current_idx_ptr]]
-
-                if internal_mode == MODE_PHOTOS:
-                    try:
-                        img = pygame.image.load(file_path).convert()
-                        img_w, img_h = img.get_size()
-                        ratio = min(float(sw)/img_w, float(sh)/img_h)
-                        current_img_raw = pygame.transform.scale(img, (int(img_w*ratio), int(img_h*ratio)))
-                        meta_data = get_sidecar_data(file_path)
-                        zoom_factor = 1.0; alpha = 0; need_load = False; last_switch = now
-                    except: current_idx_ptr = (current_idx_ptr + 1) % len(indices)
-                else:
-                    screen.fill((0, 0, 0))
-                    margin_h = 60
-                    if internal_mode == MODE_VIDEOS_GAMES:
-                        vm = parse_game_metadata(file_path)
-                        t1 = font_small.render(vm["game"], True, (255, 255, 255))
-                        t2 = font_small.render(vm["console"], True, (0, 255, 255)) # Uniformisé
-                        sh1 = font_small.render(vm["game"], True, (0, 0, 0))
-                        sh2 = font_small.render(vm["console"], True, (0, 0, 0))
-                        screen.blit(sh1, (sw - t1.get_width() - 18, sh - 43))
-                        screen.blit(t1, (sw - t1.get_width() - 20, sh - 45))
-                        screen.blit(sh2, (22, sh - 43))
-                        screen.blit(t2, (20, sh - 45))
-                    else:
-                        vm = get_sidecar_data(file_path)
-                        label = vm.get("label", u"Vidéo Perso")
-                        t1 = font_small.render(label, True, (255, 255, 255))
-                        sh1 = font_small.render(label, True, (0, 0, 0))
-                        screen.blit(sh1, (sw - t1.get_width() - 18, sh - 43))
-                        screen.blit(t1, (sw - t1.get_width() - 20, sh - 45))
-                        if vm.get("info"):
-                            t2 = font_tiny.render(u"Durée : %s" % vm["info"], True, (200, 200, 200))
-                            sh2 = font_tiny.render(u"Durée : %s" % vm["info"], True, (0, 0, 0))
-                            screen.blit(sh2, (22, sh - 43))
-                            screen.blit(t2, (20, sh - 45))
-                    pygame.display.flip()
-                    cmd = ["omxplayer", "-o", "both", "--no-osd", "--aspect-mode", "letterbox", "--win", "0,0,%d,%d" % (sw, sh - margin_h)]
-                    if is_muted: cmd += ["--vol", "-6000"]
-                    cmd.append(file_path)
-                    video_proc = subprocess.Popen(cmd, preexec_fn=os.setsid); need_load = False
-
-            if not need_load and not show_info and internal_mode == MODE_PHOTOS and now - last_switch > display_time:
-                current_idx_ptr = (current_idx_ptr + 1) % len(indices); need_load = True
-
-            # --- 5. AFFICHAGE ---
-            if internal_mode == MODE_PHOTOS and current_img_raw and not need_load:
-                screen.fill((0, 0, 0))
-                if enable_animation and not show_info: zoom_factor += ZOOM_SPEED
-                z_w, z_h = int(current_img_raw.get_width()*zoom_factor), int(current_img_raw.get_height()*zoom_factor)
-                img_to_draw = pygame.transform.scale(current_img_raw, (z_w, z_h))
-                if alpha < 255: alpha += FADE_SPEED
-                img_to_draw.set_alpha(min(alpha, 255))
-                screen.blit(img_to_draw, ((sw-z_w)//2, (sh-z_h)//2))
+                            label_raw = meta_data.get("label", u"Sans titre")
+                            clean_label = label_raw.split(" - ")[0]
+                            precise_date = meta_data.get("info", u"")
+                            line1 = u"%s  (%s)" % (clean_label, precise_date)
+                            screen.blit(text_cache.render(font_small, line1, (255, 255, 255)), (ox + 15, oy + 10))
                 
-                if show_info:
-                    ov_w, ov_h = sw * 0.7, sh * 0.12
-                    overlay = pygame.Surface((ov_w, ov_h)); overlay.set_alpha(200); overlay.fill((15, 15, 15))
-                    ox, oy = (sw-ov_w)//2, sh-ov_h-120
-                    screen.blit(overlay, (ox, oy))
-                    
-                    label_raw = meta_data.get("label", u"Sans titre")
-                    clean_label = label_raw.split(" - ")[0]
-                    precise_date = meta_data.get("info", u"")
-                    line1 = u"%s  (%s)" % (clean_label, precise_date)
-                    screen.blit(font_small.render(line1, True, (255, 255, 255)), (ox + 15, oy + 10))
-                    
-                    path_rect = pygame.Rect(ox + 15, oy + 40, ov_w - 30, ov_h - 45)
-                    draw_wrapped_text(screen, meta_data.get("source_path", u""), font_tiny, (170, 170, 170), path_rect)
-                    
-                    cnt = u"%ds" % int(max(0, info_timer - now))
-                    ctxt = font_tiny.render(cnt, True, (200, 200, 100))
-                    screen.blit(ctxt, (ox + ov_w - ctxt.get_width() - 10, oy + ov_h - 22))
-                    
-                    if last_detected_code and now < code_timer:
-                        d_txt = font_tiny.render(u"Code: %d" % last_detected_code, True, (255, 215, 0))
-                        screen.blit(d_txt, (ox + 15, oy + ov_h - 22))
-                else:
-                    if meta_data.get("label"):
-                        label = meta_data["label"]
-                        txt = font_small.render(label, True, (255, 255, 255)) # Uniformisé
-                        shd = font_small.render(label, True, (0, 0, 0))
-                        tx, ty = sw-txt.get_width()-30, sh-txt.get_height()-30
-                        screen.blit(shd, (tx+2, ty+2)); screen.blit(txt, (tx, ty))
-
-                    hy = sh - 35
-                    if now < speed_overlay_timer:
-                        img_per_min = int(round(60.0 / display_time))
-                        screen.blit(font_small.render(u"%d images / min" % img_per_min, True, (255, 230, 0)), (20, hy))
-
-            # OVERLAYS CENTRÉS
-            if now < mode_overlay_timer:
-                screen.fill((0, 0, 0)) # S'assurer que le fond est noir pendant la transition
-                mns = {MODE_PHOTOS: u"Photos", MODE_VIDEOS_PERSO: u"Vidéos", MODE_VIDEOS_GAMES: u"Jeux", MODE_CYCLE: u"Cycle Auto"}
-                txt = font_main.render(u"Mode : %s" % mns.get(current_mode), True, (0, 255, 255))
-                screen.blit(txt, ((sw - txt.get_width()) // 2, (sh - txt.get_height()) // 2))
+                            path_rect = pygame.Rect(ox + 15, oy + 40, ov_w - 30, ov_h - 45)
+                            draw_wrapped_text(screen, meta_data.get("source_path", u""), font_tiny, (170, 170, 170), path_rect, text_cache)
                 
-            if now < mute_overlay_timer:
-                mtx = u"Son : Coupé" if is_muted else u"Son : Actif"
-                txt = font_main.render(mtx, True, (255, 100, 100))
-                screen.blit(txt, ((sw - txt.get_width()) // 2, sh // 2 + 50))
-
-            pygame.display.flip()
-            time.sleep(0.04)
+                            cnt = u"%ds" % int(max(0, info_timer - now))
+                            ctxt = text_cache.render(font_tiny, cnt, (200, 200, 100))
+                            screen.blit(ctxt, (ox + ov_w - ctxt.get_width() - 10, oy + ov_h - 22))
+                
+                            if last_detected_code and now < code_timer:
+                                d_txt = text_cache.render(font_tiny, u"Code: %d" % last_detected_code, (255, 215, 0))
+                                screen.blit(d_txt, (ox + 15, oy + ov_h - 22))
+                        else:
+                            if meta_data.get("label"):
+                                label = meta_data["label"]
+                                txt = text_cache.render_shadowed(font_small, label, (255, 255, 255)) # Uniformisé
+                                screen.blit(txt, (sw-txt.get_width()-28, sh-txt.get_height()-28))
+
+                            hy = sh - 35
+                            if now < speed_overlay_timer:
+                                img_per_min = int(round(60.0 / display_time))
+                                screen.blit(text_cache.render(font_small, u"%d images / min" % img_per_min, (255, 230, 0)), (20, hy))
+
+                    # OVERLAYS CENTRÉS
+                    if now < mode_overlay_timer:
+                        screen.fill((0, 0, 0)) # S'assurer que le fond est noir pendant la transition
+                        mns = {MODE_PHOTOS: u"Photos", MODE_VIDEOS_PERSO: u"Vidéos", MODE_VIDEOS_GAMES: u"Jeux", MODE_CYCLE: u"Cycle Auto"}
+                        txt = text_cache.render(font_main, u"Mode : %s" % mns.get(current_mode), (0, 255, 255))
+                        screen.blit(txt, ((sw - txt.get_width()) // 2, (sh - txt.get_height()) // 2))
+            
+                    if now < mute_overlay_timer:
+                        mtx = u"Son : Coupé" if is_muted else u"Son : Actif"
+                        txt = text_cache.render(font_main, mtx, (255, 100, 100))
+                        screen.blit(txt, ((sw - txt.get_width()) // 2, sh // 2 + 50))
+
+                    if show_hud:
+                        y = 10
+                        for line in hud_lines:
+                            txt = font_tiny.render(line, True, (0, 255, 0), (0, 0, 0))
+                            screen.blit(txt, (10, y)); y += txt.get_height()
+
+                    profiler.mark("overlays")
+                    frame_clock.begin_flip()
+                    pygame.display.flip()
+                    frame_clock.end_flip()
+                    profiler.mark("flip")
+                    trace.frame()
+                    if first_frame:
+                        first_frame = False
+                        trace.log("shown")
+                        if control: control.reply("shown %d" % report_first_frame(show_requested_at, "resident"))
+                        else: report_first_frame(show_requested_at, "cold start")
+                # Attente de la prochaine image, interrompue dès qu'un bouton est pressé
+                pending_events = frame_clock.wait(input_reader.wait, idle=not animating) or []
+                profiler.mark("sleep")
+                profiler.maybe_write(loop_stats)
+                if show_hud and now >= hud_refresh:
+                    hud_lines = profiler.hud_lines(loop_stats()); hud_refresh = now + 0.5
+
+            # --- FIN DE SESSION ---
+            video_player.stop(); next_clip = None
+            if indices: save_playlist(internal_mode, current_idx_ptr + (0 if need_load else 1))
+            settings.flush()
+            print("[PREFETCH] %d/%d slides served from cache" % (prefetcher.hits, prefetcher.hits + prefetcher.misses))
+            if pixel_cache: print("[PIXELS] %s" % json.dumps(pixel_cache.stats(), sort_keys=True))
+            print("[FRAMES] %s" % json.dumps(frame_clock.stats(), sort_keys=True))
+            print("[POWER] %s" % json.dumps(power.stats(), sort_keys=True))
+            power.close()
+            if profiler.stats_path: profiler.write(loop_stats())
+            trace.log("session_end")
+            if not control: break
+            prefetcher.want([])
+            pygame.display.quit()
+            control.reply("hidden")
     finally:
-        if video_proc: stop_video(video_proc)
-        for f in input_files: f.close()
+        prefetcher.stop()
+        video_player.close()
+        if power: power.close()
+        settings.close()
+        input_reader.close()
+        trace.close()
+        if control: control.close()
         pygame.quit(); sys.exit()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--no-animation", action="store_true")
+    parser.add_argument("--zoom-engine", choices=ZOOM_ENGINES)
+    parser.add_argument("--transition", choices=TRANSITIONS)
+    parser.add_argument("--fps", type=int)
+    parser.add_argument("--daemon", action="store_true", help="stay resident and wait for show/hide commands from the idle monitor")
+    parser.add_argument("--profile", action="store_true", help="time each phase of the main loop and write %s" % DEFAULT_STATS_FILE)
+    parser.add_argument("--hud", action="store_true", help="show the performance HUD on screen")
+    parser.add_argument("--rescan", action="store_true", help="rebuild the media index and the gamelist cache from scratch")
+    parser.add_argument("--index-stats", action="store_true", help="print media index statistics")
     args = parser.parse_args()
-    run_slideshow(enable_animation=not args.no_animation)
+    if args.rescan or args.index_stats:
+        index = build_media_index()
+        if args.rescan or not index.load():
+            start = time.time(); index.refresh(full=args.rescan)
+            print("Index rebuilt in %.2fs (%d folders listed)" % (time.time() - start, index.listed_dirs))
+        print_index_stats(index)
+        gamelists = GamelistIndex(ROMS_FOLDER, GAMELIST_CACHE_FILE)
+        if not args.rescan: gamelists.load()
+        start = time.time(); gamelists.refresh()
+        print("%-8s %6d games  %5d gamelists  (%d parsed in %.2fs)" % ("Gamelist", len(gamelists), len(gamelists.systems), gamelists.parsed, time.time() - start))
+        sys.exit()
+    run_slideshow(enable_animation=not args.no_animation, zoom_engine=args.zoom_engine, transition=args.transition, target_fps=args.fps, daemon=args.daemon,
+                  profile=args.profile, show_hud=args.hud)
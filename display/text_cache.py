@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import re
+from collections import OrderedDict
+
+import pygame
+
+DEFAULT_MAX_ENTRIES = 128
+
+
+class TextCache(object):
+    """LRU cache of rendered text, shadowed labels, wrapped layouts and panels.
+
+    Overlays are redrawn on every animated frame while their content rarely
+    changes, so every surface is keyed on what it depends on and reused.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def _get(self, key, build):
+        try:
+            value = self._cache.pop(key)
+            self.hits += 1
+        except KeyError:
+            value = build()
+            self.misses += 1
+            if len(self._cache) >= self.max_entries:
+                self._cache.popitem(last=False)
+        self._cache[key] = value
+        return value
+
+    def render(self, font, text, color):
+        return self._get(("text", font, text, color), lambda: font.render(text, True, color))
+
+    def render_shadowed(self, font, text, color, shadow_color=(0, 0, 0), offset=(2, 2)):
+        """Text with its drop shadow pre-composited; blit it where the text itself goes."""
+        def build():
+            txt = font.render(text, True, color)
+            shd = font.render(text, True, shadow_color)
+            surface = pygame.Surface((txt.get_width() + offset[0], txt.get_height() + offset[1]), pygame.SRCALPHA)
+            surface.blit(shd, offset)
+            surface.blit(txt, (0, 0))
+            return surface
+        return self._get(("shadowed", font, text, color, shadow_color, offset), build)
+
+    def wrap(self, font, text, width, height):
+        """Splits text into lines fitting width (on path separators), as many as fit height."""
+        def build():
+            lines = []
+            max_lines = max(1, height // font.get_linesize())
+            line = ""
+            for part in re.split(r'([/\\ _-])', text):
+                test_line = line + part
+                if font.size(test_line)[0] < width:
+                    line = test_line
+                else:
+                    if line:
+                        lines.append(line)
+                    line = part
+                    if len(lines) >= max_lines:
+                        return lines
+            if line and len(lines) < max_lines:
+                lines.append(line)
+            return lines
+        return self._get(("wrap", font, text, width, height), build)
+
+    def panel(self, size, color, alpha):
+        """Plain translucent rectangle."""
+        def build():
+            surface = pygame.Surface(size)
+            surface.set_alpha(alpha)
+            surface.fill(color)
+            return surface
+        return self._get(("panel", size, color, alpha), build)
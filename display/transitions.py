@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# "fade" fades the new photo in from black (original behaviour), "cut" shows it at once.
+TRANSITIONS = ("crossfade", "slide", "wipe", "fade", "cut")
+DEFAULT_TRANSITION = "crossfade"
+
+# How the crossfade mixes the two frames: SDL surface alpha, or numpy on the pixel buffers
+BLEND_ENGINES = ("blit", "numpy")
+DEFAULT_BLEND_ENGINE = "blit"
+
+# Soft edge of the wipe, as a fraction of the screen width
+WIPE_EDGE = 1.0 / 16
+
+# numpy blend weights are in 1/128: (in - out) * 128 still fits in an int16
+BLEND_BITS = 7
+
+
+def ease(progress):
+    """Smoothstep: the slide and the wipe start and stop gently."""
+    return progress * progress * (3 - 2 * progress)
+
+
+class TransitionRenderer(object):
+    """Draws the current photo and, while a transition runs, mixes the previous frame over it.
+
+    begin() keeps a copy of the frame on screen when the next photo is ready;
+    draw() renders the new photo with the zoom renderer, then composes the
+    copy over it for the given progress (0-255, the former fade-in alpha).
+    Every buffer is allocated once per screen size, never per frame.
+    """
+
+    def __init__(self, kind=DEFAULT_TRANSITION, blend=DEFAULT_BLEND_ENGINE):
+        self.kind = kind if kind in TRANSITIONS else DEFAULT_TRANSITION
+        self.blend = blend if blend in BLEND_ENGINES else DEFAULT_BLEND_ENGINE
+        self._format = None
+        self._outgoing = None
+        self._incoming = None
+        self._band = None
+        self._ramp = None
+        self._mix = None
+        self._has_outgoing = False
+
+    def start_alpha(self):
+        return 255 if self.kind == "cut" else 0
+
+    def begin(self, screen):
+        """Keeps the frame currently on screen as the outgoing side of the transition."""
+        if self.kind in ("fade", "cut"):
+            return
+        self._allocate(screen)
+        self._outgoing.blit(screen, (0, 0))
+        self._has_outgoing = True
+
+    def _allocate(self, screen):
+        sw, sh = screen.get_size()
+        fmt = (sw, sh, screen.get_bitsize(), screen.get_masks())
+        if fmt == self._format:
+            return
+        self._format = fmt
+        self._outgoing = pygame.Surface((sw, sh), 0, screen)
+        self._incoming = pygame.Surface((sw, sh), 0, screen) if self.kind == "slide" else None
+        self._band = self._ramp = self._mix = None
+        if self.kind == "wipe":
+            edge = max(1, int(sw * WIPE_EDGE))
+            self._band = pygame.Surface((edge, sh), pygame.SRCALPHA, 32)
+            # Blend table of the soft edge: alpha of the outgoing frame, column by column
+            self._ramp = pygame.Surface((edge, sh), pygame.SRCALPHA, 32)
+            for x in range(edge):
+                self._ramp.fill((255, 255, 255, int(255 * (x + 0.5) / edge)), pygame.Rect(x, 0, 1, sh))
+        if self.kind == "crossfade" and self.blend == "numpy":
+            # Byte-wise mixing is only per channel when no channel straddles bytes
+            if numpy is None or screen.get_bitsize() not in (24, 32) or screen.get_pitch() != self._outgoing.get_pitch():
+                self.blend = "blit"
+            else:
+                self._mix = numpy.empty(sh * screen.get_pitch(), numpy.int16)
+
+    def draw(self, screen, zoom_renderer, zoom_factor, alpha):
+        if self.kind == "fade" or alpha >= 255 or not self._has_outgoing:
+            if alpha >= 255: self._has_outgoing = False
+            screen.fill((0, 0, 0))
+            zoom_renderer.draw(screen, zoom_factor, alpha if self.kind == "fade" else 255)
+            return
+        sw, sh = screen.get_size()
+        progress = alpha / 255.0
+        if self.kind == "slide":
+            self._incoming.fill((0, 0, 0))
+            zoom_renderer.draw(self._incoming, zoom_factor, 255)
+            x = int(sw * ease(progress))
+            screen.blit(self._outgoing, (-x, 0))
+            screen.blit(self._incoming, (sw - x, 0))
+            return
+        screen.fill((0, 0, 0))
+        zoom_renderer.draw(screen, zoom_factor, 255)
+        if self.kind == "wipe":
+            edge = self._band.get_width()
+            # Left of the edge is the new photo, right of it the previous frame
+            left = int((sw + edge) * ease(progress)) - edge
+            if left + edge < sw:
+                screen.blit(self._outgoing, (left + edge, 0), pygame.Rect(left + edge, 0, sw - left - edge, sh))
+            self._band.blit(self._outgoing, (0, 0), pygame.Rect(left, 0, edge, sh))
+            self._band.blit(self._ramp, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+            screen.blit(self._band, (left, 0))
+        elif self._mix is not None:
+            self._numpy_crossfade(screen, int(progress * (1 << BLEND_BITS)))
+        else:
+            self._outgoing.set_alpha(255 - int(alpha))
+            screen.blit(self._outgoing, (0, 0))
+
+    def _numpy_crossfade(self, screen, weight):
+        # screen = out + (in - out) * weight, on the raw bytes (the padding byte is mixed too)
+        incoming = numpy.frombuffer(screen.get_buffer(), numpy.uint8)
+        outgoing = numpy.frombuffer(self._outgoing.get_buffer(), numpy.uint8)
+        mix = self._mix
+        numpy.subtract(incoming, outgoing, out=mix, dtype=numpy.int16)
+        numpy.multiply(mix, weight, out=mix)
+        numpy.right_shift(mix, BLEND_BITS, out=mix)
+        numpy.add(mix, outgoing, out=mix)
+        numpy.copyto(incoming, mix, casting='unsafe')
+        # The buffer views lock the surfaces until they are released
+        del incoming, outgoing
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import os
+import time
+import signal
+import threading
+import subprocess
+
+# Seconds a stopped player gets to exit on SIGTERM before SIGKILL
+STOP_TIMEOUT = 2.0
+
+# How often the reaper checks a stopping player
+REAP_POLL = 0.05
+
+# After a failed launch the clip's label stays this long before update() moves
+# on; doubled for each failure in a row (e.g. omxplayer missing), up to the max
+ERROR_BACKOFF = 2.0
+MAX_ERROR_BACKOFF = 30.0
+
+
+class VideoPlayer(object):
+    """Owns the omxplayer processes of the video modes without blocking the UI.
+
+    stop() only signals the player; a reaper thread waits for it to exit (and
+    escalates to SIGKILL). A clip asked for while a previous player is still
+    tearing down is queued and launched by update() once it is gone, so there
+    is never more than one player writing to the screen and the audio output.
+    A clip that fails to launch counts as ended, after a back-off.
+    """
+
+    def __init__(self, stop_timeout=STOP_TIMEOUT, on_error=None):
+        self.stop_timeout = stop_timeout
+        self.on_error = on_error
+        self.proc = None
+        self.started_at = 0
+        self.launches = 0
+        self.failures = 0
+        self._failed_until = None
+        self._pending = None
+        self._stopping = []
+        self._lock = threading.Lock()
+
+    def play(self, cmd):
+        """Starts cmd now, or as soon as the previous player has exited."""
+        self.stop()
+        self._pending = list(cmd)
+        self._launch_pending()
+
+    def stop(self):
+        """Signals the current player and returns immediately."""
+        self._pending = None
+        self._failed_until = None
+        proc, self.proc = self.proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+        except OSError:
+            pass
+        with self._lock:
+            self._stopping.append(proc)
+        reaper = threading.Thread(target=self._reap, args=(proc,))
+        reaper.daemon = True
+        reaper.start()
+
+    def update(self):
+        """Launches a queued clip if possible; returns True when the playing clip ended by itself.
+
+        A clip that could not be launched is reported as ended once its back-off is over.
+        """
+        if self._pending is not None:
+            self._launch_pending()
+        if self._failed_until is not None and time.time() >= self._failed_until:
+            self._failed_until = None
+            return True
+        if self.proc is not None and self.proc.poll() is not None:
+            self.proc = None
+            return True
+        return False
+
+    def busy(self):
+        """True while a clip is playing, waiting for the previous player to exit, or backing off."""
+        return self.proc is not None or self._pending is not None or self._failed_until is not None
+
+    def close(self, timeout=STOP_TIMEOUT):
+        """Stops everything and waits (at most timeout) for the players to be reaped."""
+        self.stop()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if not self._stopping:
+                    return
+            time.sleep(REAP_POLL)
+
+    def _launch_pending(self):
+        with self._lock:
+            if self._stopping:
+                return
+        cmd, self._pending = self._pending, None
+        try:
+            # Own process group: omxplayer forks omxplayer.bin, killpg stops both
+            self.proc = subprocess.Popen(cmd, preexec_fn=os.setsid)
+            self.started_at = time.time()
+            self.launches += 1
+            self.failures = 0
+        except OSError as e:
+            self.proc = None
+            self.failures += 1
+            self._failed_until = time.time() + min(MAX_ERROR_BACKOFF, ERROR_BACKOFF * 2 ** (self.failures - 1))
+            if self.on_error:
+                self.on_error(e)
+
+    def _reap(self, proc):
+        deadline = time.time() + self.stop_timeout
+        while proc.poll() is None and time.time() < deadline:
+            time.sleep(REAP_POLL)
+        if proc.poll() is None:
+            try:
+                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+            except OSError:
+                pass
+            proc.wait()
+        with self._lock:
+            self._stopping.remove(proc)
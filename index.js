@@ -13,6 +13,22 @@ Jimp.maxMemoryUsageInMB = 1024;
 const { getBestLocation } = require('./geo');
 const { getPhotoMetadata, getBestFolderLabel, capitalize, extractDateFromPath } = require('./metadata');
 
+// Un seul fichier de métadonnées par dossier, lu en une fois par le diaporama
+const MANIFEST_NAME = 'manifest.json';
+const MANIFEST_VERSION = 1;
+
+function writeManifest(dir, files) {
+    const manifestPath = path.join(dir, MANIFEST_NAME);
+    const tmpPath = manifestPath + '.tmp';
+    try {
+        fs.writeFileSync(tmpPath, JSON.stringify({ version: MANIFEST_VERSION, files }), 'utf8');
+        fs.renameSync(tmpPath, manifestPath);
+        console.log(`Manifeste : ${Object.keys(files).length} entrées -> ${manifestPath}`);
+    } catch (e) {
+        console.error(`  ! Erreur manifeste : ${e.message}`);
+    }
+}
+
 function getVideoDuration(filePath) {
     try {
         const cmd = `ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "${filePath}"`;
@@ -76,15 +92,19 @@ async function processImage(photoPath, id, total) {
         image.scaleToFit({ w: config.SCREEN_W, h: config.SCREEN_H });
         await image.write(path.join(config.DEST_DIR, `${id}.jpg`));
 
-        const sidecarContent = [
-            finalLabel,
-            meta.fullDateStr || meta.dateStr,
-            photoPath // On utilise le chemin absolu du PC pour le diagnostic
-        ].join('\n');
+        const entry = {
+            label: finalLabel,
+            info: meta.fullDateStr || meta.dateStr,
+            source_path: photoPath // On utilise le chemin absolu du PC pour le diagnostic
+        };
 
+        // Sidecar conservé pour les diaporamas qui ne lisent pas encore le manifeste
+        const sidecarContent = [entry.label, entry.info, entry.source_path].join('\n');
         fs.writeFileSync(path.join(config.DEST_DIR, `${id}.txt`), sidecarContent, 'utf8');
+        return entry;
     } catch (e) {
         console.error(`  ! Erreur image : ${e.message}`);
+        return null;
     }
 }
 
@@ -107,6 +127,7 @@ async function processVideos(allVideoFiles) {
     let currentSizeByte = 0;
     const limitByte = config.VIDEO_LIMIT_MB * 1024 * 1024;
     let count = 0;
+    const manifest = {};
 
     for (const vidPath of shuffled) {
         const stats = fs.statSync(vidPath);
@@ -129,17 +150,20 @@ async function processVideos(allVideoFiles) {
             else if (label) finalLabel = capitalize(label);
             else if (date) finalLabel = date;
 
-            const sidecarContent = [
-                finalLabel || "Vidéo Perso",
-                duration || "Durée inconnue",
-                vidPath // Chemin PC original
-            ].join('\n');
+            const entry = {
+                label: finalLabel || "Vidéo Perso",
+                info: duration || "Durée inconnue",
+                source_path: vidPath // Chemin PC original
+            };
+            manifest[destName] = entry;
 
+            const sidecarContent = [entry.label, entry.info, entry.source_path].join('\n');
             fs.writeFileSync(path.join(config.VIDEO_DEST_DIR, `${id}.txt`), sidecarContent, 'utf8');
             currentSizeByte += stats.size;
         }
         if (currentSizeByte >= limitByte) break;
     }
+    writeManifest(config.VIDEO_DEST_DIR, manifest);
     console.log(`Total Vidéos : ${count} (${(currentSizeByte / 1024 / 1024).toFixed(1)} Mo)`);
 }
 
@@ -157,10 +181,13 @@ async function start() {
 
     if (allPhotos.length > 0) {
         const selection = allPhotos.sort(() => 0.5 - Math.random()).slice(0, config.NB_IMAGES);
+        const manifest = {};
         for (let i = 0; i < selection.length; i++) {
             const id = (i + 1).toString().padStart(3, '0');
-            await processImage(selection[i], id, selection.length);
+            const entry = await processImage(selection[i], id, selection.length);
+            if (entry) manifest[`${id}.jpg`] = entry;
         }
+        writeManifest(config.DEST_DIR, manifest);
     }
 
     const videoPattern = config.SOURCE_DIR.replace(/\\/g, '/') + '/**/*.{mp4,MP4,mkv,MKV,avi,AVI,mov,MOV}';